@@ -0,0 +1,112 @@
+"""Database routing for the optional read replica.
+
+When a ``replica`` database alias is configured (see ``DB_REPLICA_HOST`` and
+``DB_REPLICA_PATH`` in settings), reads inside ``use_replica`` views and
+``replica_reads()`` blocks go to the replica. Everything else reads from the
+primary. Writes always go to the primary. After the first write, and inside
+``pin_to_primary`` views, the rest of the request also reads from the primary
+so it sees its own writes.
+
+The routing state lives in context variables that ``ReplicaRoutingMiddleware``
+resets for every request (and ``stock.jobs`` for every job).
+"""
+from contextlib import contextmanager
+import contextvars
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+_reads_from_replica = contextvars.ContextVar('reads_from_replica', default=False)
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+def replica_configured():
+    """Return True if a read replica database alias is configured."""
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """Send opted-in reads to the replica; all writes and other reads to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if (_reads_from_replica.get() and not _pinned_to_primary.get() and replica_configured()
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Later reads in this request must see the write
+        _pinned_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to the replica (if configured and not pinned)."""
+    token = _reads_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reads_from_replica.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Route all reads inside the block to the primary."""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+@contextmanager
+def routing_scope():
+    """Start a unit of work (request, job) reading from the primary, unpinned."""
+    replica_token = _reads_from_replica.set(False)
+    pinned_token = _pinned_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(pinned_token)
+        _reads_from_replica.reset(replica_token)
+
+
+def use_replica(view_func):
+    """Decorator for read-only reporting views: their reads may go to the replica."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def pin_to_primary(view_func):
+    """Decorator for write and read-after-write views: all their reads go to the primary."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with primary_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRoutingMiddleware:
+    """Start every request reading from the primary, unpinned."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_scope():
+            return self.get_response(request)
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bar_inventory.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +79,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventory.context_processors.location_access',
             ],
         },
     },
@@ -105,13 +107,41 @@ if DJANGO_ENV == 'prod':
             },
         }
     }
+    if os.environ.get('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['DB_REPLICA_HOST'],
+            'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        }
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {},
+            # A file, not shared-cache memory, so tests get WAL and the busy timeout
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
+    # Local replica testing: a copy of db.sqlite3 (e.g. refreshed with `cp`)
+    if os.environ.get('DB_REPLICA_PATH'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['DB_REPLICA_PATH'],
+        }
+
+# SQLite concurrent-write profile (see bar_inventory.sqlite): WAL journal,
+# busy timeout in seconds, and attempts for stock writes that hit a lock.
+SQLITE_WAL = os.environ.get('SQLITE_WAL', 'True') == 'True'
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '5'))
+SQLITE_WRITE_ATTEMPTS = int(os.environ.get('SQLITE_WRITE_ATTEMPTS', '5'))
+
+# Optional read replica for reporting views (see bar_inventory.db_router).
+# Tests use the default database for it.
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['bar_inventory.db_router.PrimaryReplicaRouter']
 
 
 # Password validation
@@ -157,5 +187,44 @@ else:
     # In production, STATICFILES_DIRS should be empty
     STATICFILES_DIRS = []
 
+# Reference data catalog (see inventory.catalog): seconds a process trusts its
+# last check of the shared version stamp, and the maximum age of a catalog
+# before it is rebuilt even without a version bump.
+CATALOG_VERSION_CHECK_SECONDS = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', '1'))
+CATALOG_MAX_AGE_SECONDS = float(os.environ.get('CATALOG_MAX_AGE_SECONDS', '300'))
+
+# Default local time (HH:MM) of the daily automatic stock count taken by
+# `manage.py run_scheduler` for locations without their own auto_count_time.
+# Leave empty to only count locations that set a time.
+AUTO_STOCK_COUNT_TIME = os.environ.get('AUTO_STOCK_COUNT_TIME', '05:00')
+
+# Directory where background jobs (see stock.jobs) write export files.
+JOB_OUTPUT_DIR = os.environ.get('JOB_OUTPUT_DIR', os.path.join(BASE_DIR, 'job_output'))
+
+# Seconds without a heartbeat after which a running job counts as abandoned by
+# a dead worker and is marked failed (see stock.jobs).
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '300'))
+
+# Days an idempotency key of a stock adjustment is remembered: replays of an
+# offline tap within this window are not applied twice.
+IDEMPOTENCY_KEY_DAYS = int(os.environ.get('IDEMPOTENCY_KEY_DAYS', '7'))
+
+# Maximum number of points per beverage series in chart data; longer
+# histories are downsampled on the server (see stock.utils.downsample_series).
+STOCK_CHART_MAX_POINTS = int(os.environ.get('STOCK_CHART_MAX_POINTS', '500'))
+
+# Retention of stock count history (see stock.archive and
+# `manage.py prune_stock_counts`): counts older than the daily age keep one
+# count per day, older than the weekly age one per week. Dropped counts are
+# moved to compressed archive files in STOCK_ARCHIVE_DIR.
+STOCK_RETENTION_DAILY_DAYS = int(os.environ.get('STOCK_RETENTION_DAILY_DAYS', '90'))
+STOCK_RETENTION_WEEKLY_DAYS = int(os.environ.get('STOCK_RETENTION_WEEKLY_DAYS', '365'))
+STOCK_ARCHIVE_DIR = os.environ.get('STOCK_ARCHIVE_DIR', os.path.join(BASE_DIR, 'stock_archive'))
+
+# Seconds the stock changes feed (/api/v1/stock/changes/) holds back recent
+# changes, so writes that commit late are not skipped by a cursor that
+# already moved past them. The feed reads from the primary database.
+STOCK_CHANGES_SETTLE_SECONDS = float(os.environ.get('STOCK_CHANGES_SETTLE_SECONDS', '5'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,110 @@
+"""SQLite settings for concurrent writers.
+
+Small bars run the SQLite configuration in production, with several phones
+tapping at once. Every new SQLite connection is switched to WAL journaling
+(readers no longer block the writer), ``synchronous=NORMAL`` (safe with WAL
+and much cheaper commits), and a busy timeout so a writer waits for the lock
+instead of failing at once.
+
+Transactions stay ``DEFERRED``, so read-only blocks (reports, the admin,
+replica reads) never take the write lock. The stock write helpers, which read
+and then write, use ``immediate_atomic`` instead: on Django 5.1+ it starts
+their transaction with ``BEGIN IMMEDIATE``, so two taps never both read and
+then fail to upgrade to a write lock.
+
+``retry_on_database_locked`` covers what is left: a write that still finds
+the database locked is retried a bounded number of times with backoff.
+"""
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply the concurrent-write pragmas to new SQLite connections."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_WAL:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT * 1000)}')
+
+
+@contextmanager
+def immediate_atomic(using=DEFAULT_DB_ALIAS):
+    """
+    ``transaction.atomic()`` that takes SQLite's write lock when it begins.
+
+    Only the outermost block on SQLite is affected (Django 5.1+ honours the
+    connection's ``transaction_mode``); nested blocks and other backends
+    behave exactly like ``atomic()``.
+
+    Args:
+        using: Database alias
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or conn.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Connecting resets transaction_mode from the settings
+    conn.ensure_connection()
+    previous = getattr(conn, 'transaction_mode', None)
+    conn.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            conn.transaction_mode = previous
+            yield
+    finally:
+        conn.transaction_mode = previous
+
+
+def is_database_locked(error):
+    """Return True if an OperationalError is SQLite's "database is locked"."""
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_database_locked(func=None, *, attempts=None, base_delay=0.05):
+    """
+    Retry a database write when SQLite reports the database as locked.
+
+    The wrapped function must run its own transaction; it is not retried when
+    called inside an outer ``atomic`` block, because that transaction cannot
+    continue after the error.
+
+    Args:
+        func: Function to wrap (when used without arguments)
+        attempts: Maximum number of attempts (default: settings.SQLITE_WRITE_ATTEMPTS)
+        base_delay: Seconds to wait after the first failure; doubles per attempt, with jitter
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            max_attempts = attempts or settings.SQLITE_WRITE_ATTEMPTS
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if (attempt == max_attempts or not is_database_locked(e)
+                            or connection.in_atomic_block):
+                        raise
+                    delay = base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    logger.warning(f"{func.__name__}: database locked, retrying in {delay:.3f}s ({attempt}/{max_attempts})")
+                    time.sleep(delay)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
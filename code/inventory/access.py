@@ -0,0 +1,84 @@
+"""Location access resolution for location users.
+
+Non-staff users may only work with the location assigned to them through
+``Location.user``. The allowed location ids are resolved once per request
+with a single indexed lookup on ``Location.user`` and memoized on the
+request, so every check a view makes afterwards is free. Nothing is cached
+across requests, so a changed or revoked assignment applies to the very
+next request in every process.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .models import Location
+
+
+class LocationAccess:
+    """The set of locations a user may view and edit."""
+
+    def __init__(self, is_staff, location_ids=()):
+        self.is_staff = is_staff
+        self.location_ids = tuple(location_ids)
+
+    @property
+    def home_location_id(self):
+        """Id of the location assigned to the user, or None."""
+        return self.location_ids[0] if self.location_ids else None
+
+    def allows(self, location_id):
+        """Return True if the user may access the given location."""
+        return self.is_staff or location_id in self.location_ids
+
+
+def resolve_location_access(request):
+    """
+    Resolve the locations the current user may access.
+
+    The result is memoized on the request, so the assignment is looked up
+    at most once per request (and never for staff).
+
+    Args:
+        request: HttpRequest with an authenticated user
+
+    Returns:
+        LocationAccess: Access for the request's user
+    """
+    access = getattr(request, '_location_access', None)
+    if access is not None:
+        return access
+
+    user = request.user
+    if user.is_staff:
+        access = LocationAccess(is_staff=True)
+    else:
+        location_ids = Location.objects.filter(user=user).values_list('id', flat=True)
+        access = LocationAccess(is_staff=False, location_ids=location_ids)
+
+    request._location_access = access
+    return access
+
+
+def location_access_required(view_func=None, *, json=False):
+    """
+    Require an authenticated user and attach their access as ``request.location_access``.
+
+    Args:
+        view_func: View to wrap (when used without arguments)
+        json: Answer unauthenticated requests with a 401 JSON error instead of a redirect
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                if json:
+                    return JsonResponse({'error': 'Authentication required'}, status=401)
+                return redirect('inventory:not_logged_in')
+            request.location_access = resolve_location_access(request)
+            return func(request, *args, **kwargs)
+        return wrapper
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
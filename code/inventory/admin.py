@@ -1,4 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.shortcuts import redirect, render
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from django.utils.html import format_html
@@ -9,7 +11,10 @@ from django import forms
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import Location, UnitType, Beverage, BEVERAGE_COLORS
+from .search import IndexedSearchAdminMixin
 from .tokens import location_token_generator
+from stock.jobs import enqueue_job
+from stock.utils import assign_beverages, unassign_beverages
 
 
 class LocationResource(resources.ModelResource):
@@ -33,9 +38,11 @@ class BeverageResource(resources.ModelResource):
 @admin.register(Location)
 class LocationAdmin(ImportExportModelAdmin):
     resource_class = LocationResource
-    list_display = ['name', 'assigned_user', 'token_display', 'is_active', 'beverage_count', 'token_link']
+    list_display = ['name', 'assigned_user', 'token_display', 'is_active', 'auto_count_time', 'low_stock_count', 'beverage_count', 'token_link']
     list_filter = ['is_active']
     search_fields = ['name', 'description', 'user__username']
+    readonly_fields = ['low_stock_count', 'last_auto_count_at']
+    actions = ['save_stock_counts']
 
     def beverage_count(self, obj):
         return obj.beverages.count()
@@ -65,6 +72,12 @@ class LocationAdmin(ImportExportModelAdmin):
         return '-'
     token_link.short_description = 'Token Link'
 
+    @admin.action(description='Save stock count for selected locations (background job)')
+    def save_stock_counts(self, request, queryset):
+        location_ids = list(queryset.filter(is_active=True).values_list('id', flat=True))
+        job = enqueue_job('snapshot_locations', {'location_ids': location_ids}, user=request.user)
+        return redirect('stock:job_status', job_id=job.id)
+
 
 @admin.register(UnitType)
 class UnitTypeAdmin(ImportExportModelAdmin):
@@ -104,13 +117,16 @@ class BeverageAdminForm(forms.ModelForm):
 
 
 @admin.register(Beverage)
-class BeverageAdmin(ImportExportModelAdmin):
+class BeverageAdmin(IndexedSearchAdminMixin, ImportExportModelAdmin):
     resource_class = BeverageResource
     form = BeverageAdminForm
     list_display = ['name', 'color_display', 'unit_type', 'liters_per_unit', 'is_active', 'location_count']
     list_filter = ['is_active', 'unit_type']
-    search_fields = ['name', 'description']
+    search_fields = ['search_words__word']
+    indexed_search_fields = {'pk': Beverage}
+    search_help_text = 'Beverage name (start of a word)'
     filter_horizontal = ['available_locations']
+    actions = ['assign_to_locations', 'remove_from_locations']
 
     def color_display(self, obj):
         return format_html(
@@ -124,6 +140,44 @@ class BeverageAdmin(ImportExportModelAdmin):
         return obj.available_locations.count()
     location_count.short_description = 'Locations'
 
+    def _location_assignment(self, request, queryset, action, remove):
+        """Ask for the locations, then assign or remove the selected beverages in bulk."""
+        if request.POST.get('apply'):
+            location_ids = [int(pk) for pk in request.POST.getlist('locations') if pk.isdigit()]
+            if not location_ids:
+                self.message_user(request, 'Select at least one location.', messages.WARNING)
+            elif remove:
+                removed = unassign_beverages(queryset, location_ids)
+                self.message_user(request, f'Removed {removed} beverage assignment(s).')
+                return None
+            else:
+                result = assign_beverages(queryset, location_ids)
+                self.message_user(
+                    request,
+                    f"Added {result['assigned']} beverage assignment(s) and created {result['stocks']} stock row(s)."
+                )
+                return None
+
+        beverages = list(queryset.order_by('name'))
+        return render(request, 'admin/inventory/beverage/assign_locations.html', {
+            **self.admin_site.each_context(request),
+            'title': f"{'Remove' if remove else 'Assign'} {len(beverages)} beverage(s) {'from' if remove else 'to'} locations",
+            'opts': self.model._meta,
+            'beverages': beverages,
+            'locations': Location.objects.order_by('-is_active', 'name'),
+            'action': action,
+            'remove': remove,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.action(description='Assign selected beverages to locations')
+    def assign_to_locations(self, request, queryset):
+        return self._location_assignment(request, queryset, 'assign_to_locations', remove=False)
+
+    @admin.action(description='Remove selected beverages from locations')
+    def remove_from_locations(self, request, queryset):
+        return self._location_assignment(request, queryset, 'remove_from_locations', remove=True)
+
 
 # Unregister the default User admin
 admin.site.unregister(User)
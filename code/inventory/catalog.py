@@ -0,0 +1,220 @@
+"""Process-local cache of reference data.
+
+Locations, unit types and beverages change a few times a month but are read
+on nearly every request. The catalog keeps a compact copy of them in memory:
+beverages with their unit conversion factors, and per-location beverage lists
+in display order. It is rebuilt lazily whenever the shared version stamp
+(see ``inventory.versions``) changes; ``inventory.signals`` bumps that stamp
+on every save, delete and ``available_locations`` change.
+
+Each process checks the stamp at most every ``CATALOG_VERSION_CHECK_SECONDS``
+(write paths pass ``fresh=True`` to check it right away), rebuilds a catalog
+older than ``CATALOG_MAX_AGE_SECONDS`` even without a bump, and reads a
+beverage missing from its snapshot from the database before trusting the
+miss.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.functions import Lower
+
+from bar_inventory.db_router import primary_reads
+
+from .models import Beverage, Location
+from .search import normalize_search_text
+from .versions import bump_version, get_version
+
+VERSION_NAME = 'catalog'
+
+LocationInfo = namedtuple('LocationInfo', ['id', 'name', 'is_active'])
+
+BeverageInfo = namedtuple('BeverageInfo', [
+    'id',
+    'name',
+    'unit_type_id',
+    'unit_type',         # Display name of the unit type, e.g. "TRAY (6)"
+    'unit_quantity',     # Items per unit
+    'liters_per_unit',   # Decimal, as stored on the beverage
+    'liters_factor',     # float liters for one unit (unit_quantity * liters_per_unit)
+    'alarm_minimum',
+    'color',
+    'is_active',
+])
+
+
+class Catalog:
+    """Immutable snapshot of the reference data at one version."""
+
+    def __init__(self, version, locations, beverages, location_beverages):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.locations = locations
+        self.beverages = beverages
+        self._location_beverages = location_beverages
+        self.active_beverages = tuple(b for b in beverages.values() if b.is_active)
+        self._location_beverage_ids = {
+            location_id: frozenset(b.id for b in location_beverages)
+            for location_id, location_beverages in location_beverages.items()
+        }
+        self._name_indexes = {}
+
+    def beverage(self, beverage_id):
+        """Return the BeverageInfo for an id, or None if no such beverage exists."""
+        beverage = self.beverages.get(beverage_id)
+        if beverage is None and beverage_id is not None and (
+                Beverage.objects.using(DEFAULT_DB_ALIAS).filter(pk=beverage_id).exists()):
+            # Created after this snapshot was built, possibly by another process
+            beverage = get_catalog(rebuild=True).beverages.get(beverage_id)
+        return beverage
+
+    def beverages_for_location(self, location_id):
+        """Active beverages available at a location, ordered by case-insensitive name."""
+        return self._location_beverages.get(location_id, ())
+
+    def offers(self, location_id, beverage_id):
+        """Return True if an active beverage is available at a location."""
+        return beverage_id in self._location_beverage_ids.get(location_id, ())
+
+    def is_low(self, location_id, beverage_id, quantity):
+        """Return True if a quantity of a beverage at a location is below its alarm minimum."""
+        beverage = self.beverage(beverage_id)
+        return (beverage is not None and self.offers(location_id, beverage_id)
+                and quantity < beverage.alarm_minimum)
+
+    def search_location_beverages(self, location_id, prefix):
+        """
+        Active beverages at a location with a name word starting with prefix.
+
+        Matching ignores case and accents (the normalization of the admin
+        search) and uses a sorted index of every word-start suffix of the
+        normalized beverage names, built once per location.
+
+        Args:
+            location_id: ID of the location
+            prefix: Search text, e.g. "blo" matches "Grimbergen Blond"
+
+        Returns:
+            tuple: Matching BeverageInfo objects in display order
+        """
+        beverages = self.beverages_for_location(location_id)
+        prefix = normalize_search_text(prefix)
+        if not prefix:
+            return beverages
+
+        keys, positions = self._name_index(location_id)
+        matches = set()
+        for index in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[index].startswith(prefix):
+                break
+            matches.add(positions[index])
+        return tuple(beverages[position] for position in sorted(matches))
+
+    def _name_index(self, location_id):
+        index = self._name_indexes.get(location_id)
+        if index is None:
+            entries = []
+            for position, beverage in enumerate(self.beverages_for_location(location_id)):
+                words = normalize_search_text(beverage.name).split()
+                for start in range(len(words)):
+                    entries.append((' '.join(words[start:]), position))
+            entries.sort()
+            index = ([key for key, _ in entries], [position for _, position in entries])
+            self._name_indexes[location_id] = index
+        return index
+
+    def liters_factor(self, beverage_id):
+        """Liters in one unit of a beverage, or None if unknown."""
+        beverage = self.beverage(beverage_id)
+        return beverage.liters_factor if beverage else None
+
+
+def get_catalog_version():
+    """Return the current catalog version stamp."""
+    return get_version(VERSION_NAME)
+
+
+def bump_catalog_version():
+    """Mark the cached catalog as stale in every process."""
+    global _checked_at
+    bump_version(VERSION_NAME)
+    # This process sees its own change on the next read
+    _checked_at = None
+
+
+def _build_catalog(version):
+    locations = {
+        loc.id: LocationInfo(loc.id, loc.name, loc.is_active)
+        for loc in Location.objects.only('id', 'name', 'is_active')
+    }
+
+    beverages = {}
+    for beverage in Beverage.objects.select_related('unit_type').order_by(Lower('name'), 'id'):
+        beverages[beverage.id] = BeverageInfo(
+            id=beverage.id,
+            name=beverage.name,
+            unit_type_id=beverage.unit_type_id,
+            unit_type=str(beverage.unit_type),
+            unit_quantity=beverage.unit_type.quantity,
+            liters_per_unit=beverage.liters_per_unit,
+            liters_factor=float(beverage.unit_type.quantity) * float(beverage.liters_per_unit),
+            alarm_minimum=beverage.alarm_minimum,
+            color=beverage.color,
+            is_active=beverage.is_active,
+        )
+
+    available = {}
+    through = Beverage.available_locations.through
+    for beverage_id, location_id in through.objects.values_list('beverage_id', 'location_id'):
+        available.setdefault(location_id, set()).add(beverage_id)
+
+    # Keep the global name ordering within each location
+    location_beverages = {
+        location_id: tuple(b for b in beverages.values() if b.is_active and b.id in beverage_ids)
+        for location_id, beverage_ids in available.items()
+    }
+
+    return Catalog(version, locations, beverages, location_beverages)
+
+
+_catalog = None
+_checked_at = None
+_lock = threading.Lock()
+
+
+def get_catalog(fresh=False, rebuild=False):
+    """
+    Return the current reference data catalog, rebuilding it if stale.
+
+    Args:
+        fresh: Check the version stamp now instead of trusting a check made
+            within the last CATALOG_VERSION_CHECK_SECONDS (for write paths)
+        rebuild: Rebuild the catalog even if its version is current
+
+    Returns:
+        Catalog: Snapshot of locations and beverages
+    """
+    global _catalog, _checked_at
+    now = time.monotonic()
+    catalog = _catalog
+    checked_at = _checked_at
+    if (catalog is not None and not fresh and not rebuild and checked_at is not None
+            and now - checked_at < settings.CATALOG_VERSION_CHECK_SECONDS
+            and now - catalog.built_at < settings.CATALOG_MAX_AGE_SECONDS):
+        return catalog
+
+    version = get_catalog_version()
+    _checked_at = now
+    if (rebuild or catalog is None or catalog.version != version
+            or now - catalog.built_at >= settings.CATALOG_MAX_AGE_SECONDS):
+        with _lock:
+            # Unless another thread replaced it while this one waited
+            if _catalog is catalog:
+                # Never cache a lagging replica's data under the new version
+                with primary_reads():
+                    _catalog = _build_catalog(version)
+            catalog = _catalog
+    return catalog
@@ -0,0 +1,9 @@
+"""Template context processors for inventory."""
+from .access import resolve_location_access
+
+
+def location_access(request):
+    """Expose the current user's assigned location id as ``home_location_id``."""
+    if not request.user.is_authenticated:
+        return {}
+    return {'home_location_id': resolve_location_access(request).home_location_id}
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_location_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='auto_count_time',
+            field=models.TimeField(blank=True, help_text='Local time of the daily automatic stock count (empty: use AUTO_STOCK_COUNT_TIME)', null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='last_auto_count_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text="When the scheduler last handled this location's automatic count", null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_location_auto_count_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='low_stock_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of beverages below their alarm minimum (maintained by stock writes)'),
+        ),
+    ]
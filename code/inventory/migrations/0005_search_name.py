@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+from inventory.search import SEARCH_NAME_LENGTH, normalize_search_text
+
+
+def fill_search_names(apps, schema_editor):
+    """Store the normalized name of existing locations and beverages."""
+    for model_name in ('Location', 'Beverage'):
+        model = apps.get_model('inventory', model_name)
+        rows = list(model.objects.only('id', 'name'))
+        for row in rows:
+            row.search_name = normalize_search_text(row.name)[:SEARCH_NAME_LENGTH]
+        model.objects.bulk_update(rows, ['search_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_location_low_stock_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beverage',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+    ]
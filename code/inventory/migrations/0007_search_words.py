@@ -0,0 +1,60 @@
+# Generated by Django 5.1.15 on 2026-10-19 10:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from inventory.search import search_words
+
+
+def fill_search_words(apps, schema_editor):
+    """Index the name words of existing locations and beverages."""
+    for model_name in ('Location', 'Beverage'):
+        model = apps.get_model('inventory', model_name)
+        word_model = apps.get_model('inventory', f'{model_name}SearchWord')
+        word_model.objects.bulk_create(
+            (word_model(owner_id=pk, word=word)
+             for pk, name in model.objects.values_list('id', 'name').iterator()
+             for word in search_words(name)),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_versionstamp'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='beverage',
+            name='search_name',
+        ),
+        migrations.RemoveField(
+            model_name='location',
+            name='search_name',
+        ),
+        migrations.CreateModel(
+            name='BeverageSearchWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_words', to='inventory.beverage')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['word', 'owner'], name='beverage_search_word')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationSearchWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_words', to='inventory.location')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['word', 'owner'], name='location_search_word')],
+            },
+        ),
+        migrations.RunPython(fill_search_words, migrations.RunPython.noop),
+    ]
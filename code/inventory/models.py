@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 import random
 
+from .search import SEARCH_NAME_LENGTH, search_words, word_prefix_condition
+
 
 # Predefined list of nice, distinct colors for beverages
 BEVERAGE_COLORS = [
@@ -33,7 +35,44 @@ def get_random_color():
     return random.choice(BEVERAGE_COLORS)
 
 
-class Location(models.Model):
+class SearchNameModel(models.Model):
+    """Abstract model keeping the normalized words of ``name`` in a word table for admin search.
+
+    Concrete models need a ``SearchWord`` subclass with a foreign key named
+    ``owner`` and ``related_name='search_words'``.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'name' in update_fields:
+            self.search_words.all().delete()
+            self.search_words.model.objects.bulk_create(
+                self.search_words.model(owner=self, word=word) for word in search_words(self.name)
+            )
+
+    @classmethod
+    def search_matches(cls, word):
+        """Ids (a subquery) of the objects with a name word starting with a normalized word."""
+        word_model = cls._meta.get_field('search_words').related_model
+        return word_model.objects.filter(word_prefix_condition(word)).values('owner_id')
+
+
+class SearchWord(models.Model):
+    """One normalized word of an object's name (see inventory.search)."""
+    word = models.CharField(max_length=SEARCH_NAME_LENGTH)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.word
+
+
+class Location(SearchNameModel):
     """Represents a location in the bar where beverages are stored."""
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -46,6 +85,25 @@ class Location(models.Model):
         related_name='location',
         help_text="User assigned to this location (can only view this location)"
     )
+    auto_count_time = models.TimeField(
+        null=True,
+        blank=True,
+        help_text="Local time of the daily automatic stock count (empty: use AUTO_STOCK_COUNT_TIME)"
+    )
+    last_auto_count_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the scheduler last handled this location's automatic count"
+    )
+    low_stock_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of beverages below their alarm minimum (maintained by stock writes)"
+    )
+
+    # Kept up to date with queryset updates by the stock code and the scheduler
+    MAINTAINED_FIELDS = ('low_stock_count', 'last_auto_count_at')
 
     class Meta:
         ordering = ['name']
@@ -53,6 +111,16 @@ class Location(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # A full save of an existing location leaves the maintained fields
+        # alone, so a stale instance (admin form, import, shell) can't undo them
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class UnitType(models.Model):
     """Represents the unit type for measuring beverages."""
@@ -74,7 +142,7 @@ class UnitType(models.Model):
         return base_name
 
 
-class Beverage(models.Model):
+class Beverage(SearchNameModel):
     """Represents a beverage that can be stocked."""
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -106,3 +174,26 @@ class Beverage(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.unit_type}, {self.liters_per_unit}L)"
+
+
+class LocationSearchWord(SearchWord):
+    owner = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='search_words')
+
+    class Meta:
+        indexes = [models.Index(fields=['word', 'owner'], name='location_search_word')]
+
+
+class BeverageSearchWord(SearchWord):
+    owner = models.ForeignKey(Beverage, on_delete=models.CASCADE, related_name='search_words')
+
+    class Meta:
+        indexes = [models.Index(fields=['word', 'owner'], name='beverage_search_word')]
+
+
+class VersionStamp(models.Model):
+    """Version counter of cached data, shared by all processes (see inventory.versions)."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,85 @@
+"""Indexed name search for the admin.
+
+The default admin search turns every word into ``LIKE '%word%'`` over each
+search field, joined through to the beverage and location tables; on the
+stock history tables that is a full scan per keystroke. Locations and
+beverages instead keep every word of their name, normalized (case-folded,
+accents removed), as a row of a small word table indexed on
+``(word, owner)``. A search word matches the names with a word starting
+with it, which is a range scan on that index; the matching ids are
+resolved there first and the history tables are then only filtered on
+their indexed foreign keys.
+"""
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_NAME_LENGTH = 100
+
+
+def normalize_search_text(value):
+    """Case-fold text, strip accents and collapse whitespace, e.g. " Kriek  Boon " -> "kriek boon"."""
+    decomposed = unicodedata.normalize('NFKD', (value or '').casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def search_words(value):
+    """Distinct normalized words of a name, as stored in the word tables."""
+    return sorted({word[:SEARCH_NAME_LENGTH] for word in normalize_search_text(value).split()})
+
+
+def _prefix_end(word):
+    """Smallest string above every string starting with word, in code point order (None if unbounded)."""
+    while word:
+        last = ord(word[-1])
+        if last < 0x10ffff:
+            return word[:-1] + chr(last + 1)
+        word = word[:-1]
+    return None
+
+
+def word_prefix_condition(word, field='word'):
+    """
+    Condition matching stored words that start with a normalized search word.
+
+    SQLite compares text by code point, so the prefix is a plain range on
+    the index. Other backends compare by collation, where no upper bound
+    string is safe; ``LIKE 'word%'`` is range-scanned there instead.
+
+    Args:
+        word: Normalized search word
+        field: Path of the word column
+
+    Returns:
+        Q: Prefix condition on the column
+    """
+    if connection.vendor != 'sqlite':
+        return Q(**{f'{field}__istartswith': word})
+    end = _prefix_end(word)
+    if end is None:
+        return Q(**{f'{field}__gte': word})
+    return Q(**{f'{field}__gte': word, f'{field}__lt': end})
+
+
+class IndexedSearchAdminMixin:
+    """Admin search on the indexed name words of related locations and beverages.
+
+    ``indexed_search_fields`` maps a foreign key path of the admin's model
+    (``'pk'`` for the model itself) to the model whose names are searched.
+    Like the default admin search, every search word must match one of the
+    fields.
+    """
+    indexed_search_fields = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        words = normalize_search_text(search_term).split()
+        if not words:
+            return queryset, False
+        condition = Q()
+        for word in words:
+            word_condition = Q()
+            for path, model in self.indexed_search_fields.items():
+                word_condition |= Q(**{f'{path}__in': model.search_matches(word[:SEARCH_NAME_LENGTH])})
+            condition &= word_condition
+        return queryset.filter(condition), False
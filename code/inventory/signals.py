@@ -0,0 +1,24 @@
+"""Signal handlers for inventory models."""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Beverage, Location, UnitType
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=UnitType)
+@receiver(post_delete, sender=UnitType)
+@receiver(post_save, sender=Beverage)
+@receiver(post_delete, sender=Beverage)
+def reference_data_changed(sender, instance, **kwargs):
+    """Invalidate the reference data catalog."""
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Beverage.available_locations.through)
+def beverage_locations_changed(sender, action, **kwargs):
+    """Invalidate the reference data catalog when beverage availability changes."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
@@ -0,0 +1,32 @@
+"""Version stamps shared by all processes.
+
+The reference data catalog is tied to a version stamp that every change
+bumps. Django's default cache is local to each process, so a stamp kept
+there would never reach the other gunicorn workers, ``run_jobs`` or
+``run_scheduler``. The stamps are rows of
+``VersionStamp`` in the primary database instead: a bump is an atomic
+increment that becomes visible to every process when the change it
+belongs to commits.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from .models import VersionStamp
+
+
+def get_version(name):
+    """Return the current value of a version stamp (0 before its first bump)."""
+    value = (
+        VersionStamp.objects.using(DEFAULT_DB_ALIAS)
+        .filter(name=name).values_list('value', flat=True).first()
+    )
+    return value or 0
+
+
+def bump_version(name):
+    """Increment a version stamp, creating it on first use."""
+    if VersionStamp.objects.filter(name=name).update(value=F('value') + 1):
+        return
+    _, created = VersionStamp.objects.get_or_create(name=name, defaults={'value': 1})
+    if not created:
+        VersionStamp.objects.filter(name=name).update(value=F('value') + 1)
@@ -1,4 +1,6 @@
 from django.shortcuts import render, redirect
+from stock.utils import get_location_stock_summaries
+from .access import location_access_required
 from .models import Location
 
 
@@ -7,20 +9,19 @@ def not_logged_in(request):
     return render(request, 'inventory/not_logged_in.html')
 
 
+@location_access_required
 def index(request):
     """Home page - select a location to manage inventory."""
-    # If user is not authenticated, show not logged in page
-    if not request.user.is_authenticated:
-        return redirect('inventory:not_logged_in')
+    access = request.location_access
 
     # Staff members can see all locations
-    if request.user.is_staff:
+    if access.is_staff:
         locations = Location.objects.filter(is_active=True)
     # Regular users can only see their assigned location
-    elif hasattr(request.user, 'location') and request.user.location:
+    elif access.home_location_id is not None:
         # Redirect directly to their location
-        return redirect('stock:location_detail', location_id=request.user.location.id)
+        return redirect('stock:location_detail', location_id=access.home_location_id)
     else:
         locations = Location.objects.none()
 
-    return render(request, 'inventory/index.html', {'locations': locations})
+    return render(request, 'inventory/index.html', {'location_summaries': get_location_stock_summaries(locations)})
@@ -1,7 +1,34 @@
-from django.contrib import admin
-from import_export import resources
-from import_export.admin import ImportExportModelAdmin
-from .models import Stock, StockCount, StockCountItem
+from decimal import Decimal
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from import_export import fields, resources
+from import_export.admin import ExportMixin, ImportExportModelAdmin
+from bar_inventory.db_router import replica_reads
+from inventory.models import Beverage, Location
+from inventory.search import IndexedSearchAdminMixin
+from .jobs import enqueue_job
+from .models import BeverageRevision, IdempotencyKey, Job, Stock, StockCount, StockCountItem, StockMovement, StockTransfer
+from .utils import save_stock, transfer_stock
+
+
+class ReplicaReadsAdminMixin:
+    """Serve change lists and exports of history models from the read replica."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # Evaluate the lazy template response while reads are routed
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+    def export_action(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().export_action(request, *args, **kwargs)
 
 
 class StockResource(resources.ModelResource):
@@ -9,6 +36,13 @@ class StockResource(resources.ModelResource):
         model = Stock
         fields = ('id', 'beverage', 'location', 'quantity', 'last_updated', 'updated_by')
 
+    def save_instance(self, instance, is_create, using_transactions=True, dry_run=False):
+        # Imported quantities are recorded in the movement ledger
+        self.before_save_instance(instance, using_transactions, dry_run)
+        if using_transactions or not dry_run:
+            save_stock(instance, updated_by=instance.updated_by or 'Import')
+        self.after_save_instance(instance, using_transactions, dry_run)
+
 
 class StockCountResource(resources.ModelResource):
     class Meta:
@@ -17,39 +51,117 @@ class StockCountResource(resources.ModelResource):
 
 
 class StockCountItemResource(resources.ModelResource):
+    unit_type_name = fields.Field(attribute='revision__unit_type_name', column_name='unit_type_name', readonly=True)
+    liters_per_unit = fields.Field(attribute='revision__liters_per_unit', column_name='liters_per_unit', readonly=True)
+
     class Meta:
         model = StockCountItem
         fields = ('id', 'stock_count', 'beverage', 'quantity', 'liters', 'unit_type_name', 'liters_per_unit')
+        export_order = fields
+
+    def import_obj(self, obj, data, dry_run, **kwargs):
+        super().import_obj(obj, data, dry_run, **kwargs)
+        # Resolve the revision from the unit_type_name and liters_per_unit columns
+        if data.get('unit_type_name') and data.get('liters_per_unit') not in (None, ''):
+            obj.revision, _ = BeverageRevision.objects.get_or_create(
+                beverage_id=obj.beverage_id,
+                unit_type_name=data['unit_type_name'],
+                liters_per_unit=Decimal(str(data['liters_per_unit']))
+            )
+
+
+class StockMovementResource(resources.ModelResource):
+    class Meta:
+        model = StockMovement
+        fields = ('id', 'stock', 'kind', 'delta', 'quantity', 'user', 'updated_by', 'timestamp')
 
 
 @admin.register(Stock)
-class StockAdmin(ImportExportModelAdmin):
+class StockAdmin(IndexedSearchAdminMixin, ImportExportModelAdmin):
     resource_class = StockResource
     list_display = ['beverage', 'location', 'quantity', 'liters_display', 'last_updated', 'updated_by']
     list_filter = ['location', 'beverage__unit_type']
-    search_fields = ['beverage__name', 'location__name']
+    search_fields = ['beverage__search_words__word', 'location__search_words__word']
+    indexed_search_fields = {'beverage': Beverage, 'location': Location}
+    search_help_text = 'Beverage or location name (start of a word)'
     readonly_fields = ['last_updated']
+    actions = ['export_in_background', 'transfer_selected']
+
+    def save_model(self, request, obj, form, change):
+        # Quantity edits are recorded in the movement ledger
+        save_stock(obj, updated_by=request.user.get_username(), user=request.user)
 
     def liters_display(self, obj):
         return f"{obj.liters:.2f}L"
     liters_display.short_description = 'Liters'
 
+    @admin.action(description='Transfer selected stock to another location')
+    def transfer_selected(self, request, queryset):
+        stocks = list(queryset.select_related('beverage', 'location').order_by('beverage__name'))
+        if len({stock.location_id for stock in stocks}) != 1:
+            self.message_user(request, 'Select stock of a single source location to transfer.', messages.WARNING)
+            return None
+        source = stocks[0].location
+
+        if request.POST.get('apply'):
+            lines = [
+                (stock.beverage_id, request.POST.get(f'quantity_{stock.id}', '').strip())
+                for stock in stocks
+            ]
+            try:
+                destination = Location.objects.get(id=int(request.POST.get('destination', '')), is_active=True)
+                stock_transfer = transfer_stock(
+                    source, destination, [line for line in lines if line[1]],
+                    updated_by=request.user.get_username(),
+                    user=request.user,
+                    note=request.POST.get('note', '')[:255]
+                )
+            except (ValueError, ArithmeticError, Location.DoesNotExist) as e:
+                self.message_user(request, f'Transfer failed: {e}', messages.ERROR)
+            else:
+                line_count = stock_transfer.movements.filter(delta__gt=0).count()
+                self.message_user(request, f'Transferred {line_count} beverage(s) from {source} to {destination}.')
+                return None
+
+        return render(request, 'admin/stock/stock/transfer_stock.html', {
+            **self.admin_site.each_context(request),
+            'title': f'Transfer stock from {source}',
+            'opts': self.model._meta,
+            'stocks': stocks,
+            'source': source,
+            'destinations': Location.objects.filter(is_active=True).exclude(id=source.id),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.action(description='Export selected stock as CSV (background job)')
+    def export_in_background(self, request, queryset):
+        stock_ids = list(queryset.values_list('id', flat=True))
+        job = enqueue_job('export_stock', {'stock_ids': stock_ids}, user=request.user)
+        return redirect('stock:job_status', job_id=job.id)
+
 
 class StockCountItemInline(admin.TabularInline):
     model = StockCountItem
     extra = 0
     readonly_fields = ['beverage', 'quantity', 'liters', 'unit_type_name', 'liters_per_unit']
+    exclude = ['revision']
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('beverage', 'revision')
+
 
 @admin.register(StockCount)
-class StockCountAdmin(ImportExportModelAdmin):
+class StockCountAdmin(IndexedSearchAdminMixin, ReplicaReadsAdminMixin, ImportExportModelAdmin):
     resource_class = StockCountResource
     list_display = ['location', 'timestamp', 'item_count', 'total_liters_display']
     list_filter = ['location', 'timestamp']
-    search_fields = ['location__name']
+    search_fields = ['location__search_words__word']
+    indexed_search_fields = {'location': Location}
+    search_help_text = 'Location name (start of a word)'
     readonly_fields = ['timestamp']
     inlines = [StockCountItemInline]
+    actions = ['compare_counts']
 
     def item_count(self, obj):
         return obj.items.count()
@@ -59,11 +171,134 @@ class StockCountAdmin(ImportExportModelAdmin):
         return f"{obj.total_liters:.2f}L"
     total_liters_display.short_description = 'Total Liters'
 
+    @admin.action(description='Compare selected counts (one: with live stock)')
+    def compare_counts(self, request, queryset):
+        counts = list(queryset.order_by('timestamp')[:3])
+        if len(counts) > 2:
+            self.message_user(request, 'Select one or two stock counts to compare.', messages.WARNING)
+            return None
+        url = f"{reverse('stock:count_diff')}?a={counts[0].pk}"
+        if len(counts) == 2:
+            url += f"&b={counts[1].pk}"
+        return redirect(url)
+
 
 @admin.register(StockCountItem)
-class StockCountItemAdmin(ImportExportModelAdmin):
+class StockCountItemAdmin(IndexedSearchAdminMixin, ReplicaReadsAdminMixin, ImportExportModelAdmin):
     resource_class = StockCountItemResource
     list_display = ['stock_count', 'beverage', 'quantity', 'liters', 'unit_type_name']
     list_filter = ['stock_count__location', 'stock_count__timestamp']
-    search_fields = ['beverage__name', 'stock_count__location__name']
+    search_fields = ['beverage__search_words__word', 'stock_count__location__search_words__word']
+    indexed_search_fields = {'beverage': Beverage, 'stock_count__location': Location}
+    search_help_text = 'Beverage or location name (start of a word)'
     readonly_fields = ['stock_count', 'beverage', 'quantity', 'liters', 'unit_type_name', 'liters_per_unit']
+    exclude = ['revision']
+    list_select_related = ['stock_count__location', 'beverage', 'revision']
+
+    def get_export_queryset(self, request):
+        return super().get_export_queryset(request).select_related('revision')
+
+
+class TransferMovementInline(admin.TabularInline):
+    model = StockMovement
+    extra = 0
+    fields = ['stock', 'delta', 'quantity']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('stock__beverage', 'stock__location')
+
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(ReplicaReadsAdminMixin, admin.ModelAdmin):
+    """Read-only list of stock transfers; transfers are made from the Stock admin or the transfer page."""
+    list_display = ['timestamp', 'source', 'destination', 'updated_by', 'note']
+    list_filter = ['source', 'destination', 'timestamp']
+    search_fields = ['note', 'updated_by', 'source__name', 'destination__name']
+    list_select_related = ['source', 'destination']
+    date_hierarchy = 'timestamp'
+    inlines = [TransferMovementInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BeverageRevision)
+class BeverageRevisionAdmin(IndexedSearchAdminMixin, ReplicaReadsAdminMixin, admin.ModelAdmin):
+    """Read-only list of the beverage values referenced by stock count items."""
+    list_display = ['beverage', 'unit_type_name', 'liters_per_unit', 'created_at']
+    list_filter = ['unit_type_name']
+    search_fields = ['beverage__search_words__word']
+    indexed_search_fields = {'beverage': Beverage}
+    search_help_text = 'Beverage name (start of a word)'
+    list_select_related = ['beverage']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    """Read-only list of the idempotency keys of applied offline taps (purged by run_scheduler)."""
+    list_display = ['key', 'user', 'created_at', 'expires_at']
+    search_fields = ['key', 'user__username']
+    list_select_related = ['user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(IndexedSearchAdminMixin, ReplicaReadsAdminMixin, ExportMixin, admin.ModelAdmin):
+    """Read-only view of the append-only stock movement ledger."""
+    resource_class = StockMovementResource
+    list_display = ['timestamp', 'stock', 'kind', 'delta', 'quantity', 'updated_by', 'user']
+    list_filter = ['kind', 'stock__location', 'user', 'timestamp']
+    search_fields = ['stock__beverage__search_words__word', 'stock__location__search_words__word']
+    indexed_search_fields = {'stock__beverage': Beverage, 'stock__location': Location}
+    search_help_text = 'Beverage or location name (start of a word)'
+    list_select_related = ['stock__beverage', 'stock__location', 'user']
+    date_hierarchy = 'timestamp'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Background jobs; queued from views, admin actions and the enqueue_job command."""
+    list_display = ['id', 'kind', 'status', 'progress', 'total', 'message', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = [
+        'kind', 'params', 'status', 'progress', 'total', 'message', 'result',
+        'created_by', 'created_at', 'started_at', 'finished_at'
+    ]
+    list_select_related = ['created_by']
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,313 @@
+"""Tiered retention of stock count history with a compressed on-disk archive.
+
+Nobody needs every count from years ago, but the hot ``StockCount`` and
+``StockCountItem`` tables feed the charts and reports. ``prune_count_history``
+keeps one count per location and day for history older than
+``STOCK_RETENTION_DAILY_DAYS`` and one per week beyond
+``STOCK_RETENTION_WEEKLY_DAYS``; the full-fidelity rows of every other count
+move to the archive before they are deleted.
+
+The archive holds one zip file per location and month in
+``STOCK_ARCHIVE_DIR``. Every member is one deflate-compressed column of
+little-endian fixed-width values (``array`` type codes, see ``COLUMNS``):
+counts are stored once (id, timestamp) and their items as flat columns with
+an offsets column pointing at each count's first item. Quantities and liters
+are stored as exact hundredths. ``iter_archived_counts`` reads them back.
+"""
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import json
+import os
+import sys
+import zipfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+ARCHIVE_FORMAT_VERSION = 1
+
+# Column name -> array type code. Count columns have one value per count,
+# item columns one per item; item_offset has one extra trailing entry.
+COLUMNS = {
+    'count_id': 'q',
+    'timestamp': 'q',        # Epoch seconds
+    'item_offset': 'q',
+    'beverage_id': 'q',
+    'revision_id': 'q',
+    'quantity': 'q',         # Hundredths of a unit
+    'liters': 'q',           # Hundredths of a liter
+}
+
+ArchivedCount = namedtuple('ArchivedCount', ['id', 'location_id', 'timestamp', 'items'])
+ArchivedItem = namedtuple('ArchivedItem', ['beverage_id', 'revision_id', 'quantity', 'liters'])
+
+HUNDRED = Decimal('100')
+CENT = Decimal('0.01')
+
+
+def archive_path(location_id, period):
+    """Return the archive file of a location for a period ("YYYY-MM")."""
+    return os.path.join(settings.STOCK_ARCHIVE_DIR, f'location-{location_id}', f'{period}.zip')
+
+
+def _period(moment):
+    return timezone.localtime(moment).strftime('%Y-%m')
+
+
+def _read_columns(path):
+    with zipfile.ZipFile(path) as archive:
+        meta = json.loads(archive.read('meta.json'))
+        if meta['version'] > ARCHIVE_FORMAT_VERSION:
+            raise ValueError(f'Unsupported archive version {meta["version"]}: {path}')
+        columns = {}
+        for name, typecode in COLUMNS.items():
+            values = array(typecode)
+            values.frombytes(archive.read(name))
+            if sys.byteorder != 'little':
+                values.byteswap()
+            columns[name] = values
+    return columns
+
+
+def _write_columns(path, columns):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp'
+    with zipfile.ZipFile(temporary, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('meta.json', json.dumps({
+            'version': ARCHIVE_FORMAT_VERSION,
+            'columns': COLUMNS,
+            'counts': len(columns['count_id']),
+            'items': len(columns['beverage_id']),
+        }))
+        for name in COLUMNS:
+            values = columns[name]
+            if sys.byteorder != 'little':
+                values = array(values.typecode, values)
+                values.byteswap()
+            archive.writestr(name, values.tobytes())
+    # Readers never see a half-written file
+    os.replace(temporary, path)
+
+
+def _counts_from_columns(location_id, columns):
+    offsets = columns['item_offset']
+    for index, count_id in enumerate(columns['count_id']):
+        items = [
+            ArchivedItem(
+                beverage_id=columns['beverage_id'][position],
+                revision_id=columns['revision_id'][position],
+                quantity=Decimal(columns['quantity'][position]) / HUNDRED,
+                liters=Decimal(columns['liters'][position]) / HUNDRED,
+            )
+            for position in range(offsets[index], offsets[index + 1])
+        ]
+        yield ArchivedCount(
+            id=count_id,
+            location_id=location_id,
+            timestamp=datetime.fromtimestamp(columns['timestamp'][index], tz=dt_timezone.utc),
+            items=items,
+        )
+
+
+def write_archived_counts(location_id, period, counts):
+    """
+    Add counts to a location's archive file for a period.
+
+    Counts already in the file are replaced, so an interrupted prune can be
+    run again safely.
+
+    Args:
+        location_id: ID of the location
+        period: Month of the counts, "YYYY-MM"
+        counts: Iterable of ArchivedCount
+
+    Returns:
+        str: Path of the archive file
+    """
+    path = archive_path(location_id, period)
+    merged = {}
+    if os.path.exists(path):
+        merged = {count.id: count for count in _counts_from_columns(location_id, _read_columns(path))}
+    merged.update((count.id, count) for count in counts)
+
+    columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+    for count in sorted(merged.values(), key=lambda count: (count.timestamp, count.id)):
+        columns['count_id'].append(count.id)
+        columns['timestamp'].append(int(count.timestamp.timestamp()))
+        columns['item_offset'].append(len(columns['beverage_id']))
+        for item in count.items:
+            columns['beverage_id'].append(item.beverage_id)
+            columns['revision_id'].append(item.revision_id)
+            columns['quantity'].append(int((item.quantity * HUNDRED).to_integral_value()))
+            columns['liters'].append(int((item.liters * HUNDRED).to_integral_value()))
+    columns['item_offset'].append(len(columns['beverage_id']))
+
+    _write_columns(path, columns)
+    return path
+
+
+def iter_archived_counts(location_id, start=None, end=None):
+    """
+    Read archived counts of a location in chronological order.
+
+    Only the monthly files overlapping the requested range are opened.
+
+    Args:
+        location_id: ID of the location
+        start: Optional aware datetime; earlier counts are skipped
+        end: Optional aware datetime; later counts are skipped
+
+    Yields:
+        ArchivedCount: Archived counts with their items (Decimal quantities and liters)
+    """
+    directory = os.path.join(settings.STOCK_ARCHIVE_DIR, f'location-{location_id}')
+    if not os.path.isdir(directory):
+        return
+    first = _period(start) if start else None
+    last = _period(end) if end else None
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.zip'):
+            continue
+        period = name[:-len('.zip')]
+        if (first and period < first) or (last and period > last):
+            continue
+        for count in _counts_from_columns(location_id, _read_columns(os.path.join(directory, name))):
+            if (start and count.timestamp < start) or (end and count.timestamp > end):
+                continue
+            yield count
+
+
+def select_counts_to_prune(counts, daily_before, weekly_before):
+    """
+    Pick the counts that tiered retention drops.
+
+    Counts before ``weekly_before`` keep the last count per location and ISO
+    week, counts before ``daily_before`` the last one per location and (local)
+    day; newer counts are all kept.
+
+    Args:
+        counts: List of (count_id, location_id, timestamp) tuples in chronological order
+        daily_before: Aware datetime where daily retention starts
+        weekly_before: Aware datetime where weekly retention starts
+
+    Returns:
+        list: IDs of the counts to archive and delete
+    """
+    kept = {}
+    for count_id, location_id, moment in counts:
+        if moment >= daily_before:
+            continue
+        day = timezone.localtime(moment).date()
+        bucket = day.isocalendar()[:2] if moment < weekly_before else day
+        # Later counts replace earlier ones: the last count of a bucket is kept
+        kept[(location_id, bucket)] = count_id
+    keep = set(kept.values())
+    return [
+        count_id for count_id, location_id, moment in counts
+        if moment < daily_before and count_id not in keep
+    ]
+
+
+def prune_count_history(now=None, daily_after_days=None, weekly_after_days=None, dry_run=False, batch_size=500):
+    """
+    Downsample old stock counts, moving dropped counts to the archive.
+
+    Args:
+        now: Reference moment (default: now)
+        daily_after_days: Age in days after which one count per day is kept
+            (default: settings.STOCK_RETENTION_DAILY_DAYS)
+        weekly_after_days: Age in days after which one count per week is kept
+            (default: settings.STOCK_RETENTION_WEEKLY_DAYS)
+        dry_run: Only report what would be pruned
+        batch_size: Number of counts archived and deleted per transaction
+
+    Returns:
+        dict: Number of pruned counts and items, and the archive files written
+    """
+    from .models import StockCount, StockCountItem
+
+    now = now or timezone.now()
+    if daily_after_days is None:
+        daily_after_days = settings.STOCK_RETENTION_DAILY_DAYS
+    if weekly_after_days is None:
+        weekly_after_days = settings.STOCK_RETENTION_WEEKLY_DAYS
+    daily_before = now - timedelta(days=daily_after_days)
+    weekly_before = now - timedelta(days=max(weekly_after_days, daily_after_days))
+
+    counts = list(
+        StockCount.objects.filter(timestamp__lt=daily_before)
+        .order_by('timestamp', 'id').values_list('id', 'location_id', 'timestamp')
+    )
+    pruned = select_counts_to_prune(counts, daily_before, weekly_before)
+    result = {'counts': len(pruned), 'items': 0, 'files': []}
+    if dry_run:
+        result['items'] = StockCountItem.objects.filter(stock_count_id__in=pruned).count() if pruned else 0
+        return result
+
+    files = set()
+    for start in range(0, len(pruned), batch_size):
+        batch = pruned[start:start + batch_size]
+        archived = {}
+        for count_id, location_id, moment in (
+                StockCount.objects.filter(id__in=batch).order_by()
+                .values_list('id', 'location_id', 'timestamp')):
+            archived[count_id] = ArchivedCount(count_id, location_id, moment, [])
+        for count_id, beverage_id, revision_id, quantity, liters in (
+                StockCountItem.objects.filter(stock_count_id__in=batch).order_by('id')
+                .values_list('stock_count_id', 'beverage_id', 'revision_id', 'quantity', 'liters')):
+            archived[count_id].items.append(ArchivedItem(beverage_id, revision_id, quantity, liters.quantize(CENT)))
+            result['items'] += 1
+
+        by_file = {}
+        for count in archived.values():
+            by_file.setdefault((count.location_id, _period(count.timestamp)), []).append(count)
+        # Archive first: deleting only after the files are written loses nothing if interrupted
+        for (location_id, period), period_counts in by_file.items():
+            files.add(write_archived_counts(location_id, period, period_counts))
+        with transaction.atomic():
+            StockCountItem.objects.filter(stock_count_id__in=batch).delete()
+            StockCount.objects.filter(id__in=batch).delete()
+
+    result['files'] = sorted(files)
+    return result
+
+
+def get_count_history(location_id, start=None, end=None):
+    """
+    Stock counts of a location from both the database and the archive.
+
+    Args:
+        location_id: ID of the location
+        start: Optional aware datetime; earlier counts are skipped
+        end: Optional aware datetime; later counts are skipped
+
+    Returns:
+        list: Dicts with id, timestamp, archived and items (ArchivedItem), in chronological order
+    """
+    from .models import StockCount, StockCountItem
+
+    counts = StockCount.objects.filter(location_id=location_id)
+    if start:
+        counts = counts.filter(timestamp__gte=start)
+    if end:
+        counts = counts.filter(timestamp__lte=end)
+    live = {
+        count_id: {'id': count_id, 'timestamp': moment, 'archived': False, 'items': []}
+        for count_id, moment in counts.order_by().values_list('id', 'timestamp')
+    }
+    for count_id, beverage_id, revision_id, quantity, liters in (
+            StockCountItem.objects.filter(stock_count_id__in=live).order_by('id')
+            .values_list('stock_count_id', 'beverage_id', 'revision_id', 'quantity', 'liters')):
+        live[count_id]['items'].append(ArchivedItem(beverage_id, revision_id, quantity, liters))
+
+    history = list(live.values())
+    history.extend(
+        {'id': count.id, 'timestamp': count.timestamp, 'archived': True, 'items': count.items}
+        for count in iter_archived_counts(location_id, start, end)
+        if count.id not in live
+    )
+    history.sort(key=lambda count: (count['timestamp'], count['id']))
+    return history
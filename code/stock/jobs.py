@@ -0,0 +1,253 @@
+"""Background jobs for heavy stock operations.
+
+Jobs are rows in the ``Job`` table, so no external broker is needed: views
+and admin actions enqueue them and the ``run_jobs`` management command
+claims and executes them in a thread pool. Handlers report progress through
+``JobContext.report``, which the HTMX-polled job status page reads back.
+
+A running job holds a lease: the worker refreshes its ``heartbeat_at`` while
+it runs. When a worker dies, its jobs stop heartbeating and the next claim
+marks them failed after ``JOB_LEASE_SECONDS``, instead of leaving them
+running forever. They are not requeued, because handlers such as imports
+are not safe to run twice.
+"""
+from datetime import timedelta
+import logging
+import os
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bar_inventory.db_router import replica_reads, routing_scope
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind."""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """Handle passed to job handlers for reporting progress."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def report(self, progress, total=None, message=None):
+        """
+        Store the job's progress.
+
+        Args:
+            progress: Number of steps done
+            total: Optional total number of steps
+            message: Optional status message
+        """
+        fields = {'progress': progress, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        if message is not None:
+            fields['message'] = message[:255]
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(self.job, name, value)
+
+
+def enqueue_job(kind, params=None, user=None):
+    """
+    Queue a job for the background worker.
+
+    Args:
+        kind: Registered job handler name
+        params: JSON-serializable parameters for the handler
+        user: Optional user who requested the job
+
+    Returns:
+        Job: The queued job
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None
+    )
+
+
+def heartbeat_jobs(job_ids):
+    """Renew the lease of running jobs."""
+    if job_ids:
+        Job.objects.filter(pk__in=job_ids, status=Job.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+
+
+def fail_stale_jobs(now=None):
+    """
+    Fail running jobs whose worker stopped heartbeating.
+
+    Args:
+        now: Reference moment (default: now)
+
+    Returns:
+        int: Number of jobs marked failed
+    """
+    now = now or timezone.now()
+    expired = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=expired) | Q(heartbeat_at__isnull=True, started_at__lt=expired),
+        status=Job.STATUS_RUNNING
+    )
+    failed = stale.update(
+        status=Job.STATUS_FAILED,
+        message='Worker stopped responding',
+        finished_at=now
+    )
+    if failed:
+        logger.warning(f"Failed {failed} job(s) whose worker stopped responding")
+    return failed
+
+
+def claim_next_job():
+    """
+    Atomically claim the oldest queued job.
+
+    The claim is a conditional UPDATE, so several workers can poll the same
+    table without running a job twice. Jobs of dead workers are failed first.
+
+    Returns:
+        Job: The claimed job, or None if the queue is empty
+    """
+    fail_stale_jobs()
+    while True:
+        job_id = (
+            Job.objects.filter(status=Job.STATUS_QUEUED)
+            .order_by('created_at', 'id').values_list('id', flat=True).first()
+        )
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def run_job(job):
+    """
+    Execute a claimed job and store its outcome.
+
+    Args:
+        job: Job in the running state
+    """
+    close_old_connections()
+    try:
+        handler = JOB_HANDLERS[job.kind]
+        with routing_scope():
+            result = handler(JobContext(job), **job.params)
+    except Exception as e:
+        logger.exception(f"Job {job.pk} ({job.kind}) failed")
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_FAILED,
+            message=str(e)[:255],
+            finished_at=timezone.now()
+        )
+    else:
+        # A job failed as stale meanwhile keeps that outcome
+        Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_DONE,
+            result=result,
+            finished_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def job_output_path(job, extension):
+    """Return the path of a file written by a job, creating the output directory."""
+    os.makedirs(settings.JOB_OUTPUT_DIR, exist_ok=True)
+    return os.path.join(settings.JOB_OUTPUT_DIR, f"{job.kind}-{job.pk}.{extension}")
+
+
+@job_handler('snapshot_locations')
+def snapshot_locations_job(context, location_ids=None):
+    """Save a stock count for each given location (default: all active locations)."""
+    from inventory.models import Location
+    from .utils import create_stock_count
+
+    locations = Location.objects.filter(is_active=True)
+    if location_ids is not None:
+        locations = locations.filter(id__in=location_ids)
+    locations = list(locations)
+
+    count_ids = []
+    context.report(0, len(locations), 'Saving counts')
+    for index, location in enumerate(locations, start=1):
+        stock_count = create_stock_count(location)
+        count_ids.append(stock_count.pk)
+        context.report(index, message=f'Saved count for {location.name}')
+
+    return {'count_ids': count_ids}
+
+
+@job_handler('export_stock')
+def export_stock_job(context, stock_ids=None, file_format='csv'):
+    """Export stock rows (default: all) to a file in JOB_OUTPUT_DIR."""
+    from .admin import StockResource
+    from .models import Stock
+
+    queryset = Stock.objects.select_related('beverage', 'location')
+    if stock_ids is not None:
+        queryset = queryset.filter(id__in=stock_ids)
+
+    context.report(0, 1, 'Exporting stock')
+    with replica_reads():
+        dataset = StockResource().export(queryset)
+    path = job_output_path(context.job, file_format)
+    content = dataset.export(file_format)
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    with open(path, mode) as output:
+        output.write(content)
+    context.report(1, message=f'Exported {len(dataset)} rows')
+
+    return {'file': os.path.basename(path), 'rows': len(dataset)}
+
+
+@job_handler('import_stock')
+def import_stock_job(context, path, file_format='csv', dry_run=False):
+    """Import stock rows from a file (CSV by default) in one transaction."""
+    import tablib
+    from .admin import StockResource
+
+    with open(path, 'rb' if file_format == 'xlsx' else 'r') as source:
+        dataset = tablib.Dataset().load(source.read(), format=file_format)
+
+    context.report(0, len(dataset), 'Importing stock')
+    with transaction.atomic():
+        result = StockResource().import_data(dataset, dry_run=dry_run, raise_errors=True)
+    totals = dict(result.totals)
+    context.report(len(dataset), message=f"Imported {len(dataset)} rows")
+
+    return {'totals': totals, 'dry_run': dry_run}
+
+
+@job_handler('rebuild_low_stock')
+def rebuild_low_stock_job(context):
+    """Recompute every low-stock flag and location alert counter."""
+    from .utils import recount_low_stock, refresh_low_stock
+
+    context.report(0, 1, 'Rebuilding low-stock flags')
+    changed = refresh_low_stock()
+    recount_low_stock()
+    context.report(1, message=f'Corrected {changed} flags')
+
+    return {'changed': changed}
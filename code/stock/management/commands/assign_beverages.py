@@ -0,0 +1,55 @@
+"""Assign beverages to (or remove them from) many locations at once."""
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Beverage, Location
+from stock.utils import assign_beverages, unassign_beverages
+
+
+class Command(BaseCommand):
+    help = 'Make beverages available at locations in bulk, creating their stock rows (or remove them with --remove)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--beverage',
+            type=int,
+            action='append',
+            dest='beverages',
+            help='Beverage ID (repeatable, default: all active beverages)'
+        )
+        parser.add_argument(
+            '--location',
+            type=int,
+            action='append',
+            dest='locations',
+            help='Location ID (repeatable, default: all active locations)'
+        )
+        parser.add_argument('--remove', action='store_true', help='Remove the beverages from the locations instead')
+
+    def handle(self, *args, **options):
+        if options['beverages']:
+            beverages = Beverage.objects.filter(id__in=options['beverages'])
+        else:
+            beverages = Beverage.objects.filter(is_active=True)
+        if options['locations']:
+            locations = Location.objects.filter(id__in=options['locations'])
+        else:
+            locations = Location.objects.filter(is_active=True)
+
+        beverage_ids = list(beverages.values_list('id', flat=True))
+        location_ids = list(locations.values_list('id', flat=True))
+        unknown = set(options['beverages'] or ()) - set(beverage_ids)
+        if unknown:
+            raise CommandError(f"Unknown beverage ID(s): {', '.join(map(str, sorted(unknown)))}")
+        unknown = set(options['locations'] or ()) - set(location_ids)
+        if unknown:
+            raise CommandError(f"Unknown location ID(s): {', '.join(map(str, sorted(unknown)))}")
+
+        if options['remove']:
+            removed = unassign_beverages(beverage_ids, location_ids)
+            self.stdout.write(f"Removed {removed} assignment(s)")
+        else:
+            result = assign_beverages(beverage_ids, location_ids)
+            self.stdout.write(
+                f"Added {result['assigned']} assignment(s) of {len(beverage_ids)} beverage(s) "
+                f"to {len(location_ids)} location(s), created {result['stocks']} stock row(s)"
+            )
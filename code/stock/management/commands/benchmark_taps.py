@@ -0,0 +1,84 @@
+"""Measure stock tap throughput with concurrent writers."""
+from concurrent.futures import ThreadPoolExecutor
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from inventory.models import Beverage, Location, UnitType
+from stock.models import Stock
+from stock.utils import adjust_stock_quantity
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent quick-adjust taps against the configured database (uses a temporary location)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Concurrent writer threads (default: 4)')
+        parser.add_argument('--taps', type=int, default=250, help='Taps per writer (default: 250)')
+        parser.add_argument('--beverages', type=int, default=10, help='Stock rows to spread taps over (default: 10)')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark location and its data')
+
+    def handle(self, *args, **options):
+        location, unit_type = self._setup(options['beverages'])
+        stock_ids = list(Stock.objects.filter(location=location).values_list('id', flat=True))
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            local_latencies, local_errors = [], []
+            try:
+                for _ in range(options['taps']):
+                    stock = Stock(pk=rng.choice(stock_ids))
+                    started = time.perf_counter()
+                    try:
+                        adjust_stock_quantity(stock, rng.choice(['1', '-1']), updated_by='benchmark')
+                    except DatabaseError as e:
+                        local_errors.append(str(e))
+                    local_latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+        connection.close()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['writers']) as executor:
+            list(executor.map(writer, range(options['writers'])))
+        elapsed = time.perf_counter() - started
+
+        total = options['writers'] * options['taps']
+        latencies.sort()
+        self.stdout.write(f"Database:    {connection.vendor} ({connection.settings_dict['NAME']})")
+        self.stdout.write(f"Writers:     {options['writers']}, taps: {total}, stock rows: {len(stock_ids)}")
+        self.stdout.write(f"Throughput:  {total / elapsed:.1f} taps/s ({elapsed:.2f}s)")
+        self.stdout.write(
+            f"Latency:     p50 {statistics.median(latencies) * 1000:.1f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms, "
+            f"max {latencies[-1] * 1000:.1f}ms"
+        )
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(f"Errors:      {len(errors)}"))
+        for message in sorted(set(errors))[:5]:
+            self.stdout.write(f"  {message}")
+
+        if not options['keep']:
+            location.delete()
+            Beverage.objects.filter(unit_type=unit_type).delete()
+            unit_type.delete()
+
+    def _setup(self, beverage_count):
+        suffix = f"{int(time.time())}"
+        unit_type = UnitType.objects.create(name=f'BENCHMARK_{suffix}', quantity=1)
+        location = Location.objects.create(name=f'Benchmark {suffix}', is_active=False)
+        beverages = [
+            Beverage.objects.create(name=f'benchmark {suffix} {index}', unit_type=unit_type, liters_per_unit=1, is_active=False)
+            for index in range(beverage_count)
+        ]
+        Stock.objects.bulk_create([Stock(beverage=beverage, location=location) for beverage in beverages])
+        return location, unit_type
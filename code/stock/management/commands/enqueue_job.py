@@ -0,0 +1,25 @@
+"""Queue a background job."""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.jobs import JOB_HANDLERS, enqueue_job
+
+
+class Command(BaseCommand):
+    help = 'Queue a background job for the run_jobs worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(JOB_HANDLERS), help='Job kind')
+        parser.add_argument('--params', default='{}', help='Job parameters as a JSON object, e.g. \'{"path": "stock.csv"}\'')
+
+    def handle(self, *args, **options):
+        try:
+            params = json.loads(options['params'])
+        except ValueError as e:
+            raise CommandError(f"Invalid --params JSON: {e}")
+        if not isinstance(params, dict):
+            raise CommandError('--params must be a JSON object')
+
+        job = enqueue_job(options['kind'], params)
+        self.stdout.write(self.style.SUCCESS(f"Queued {job}"))
@@ -0,0 +1,30 @@
+"""Downsample old stock count history and archive the dropped counts."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stock.archive import prune_count_history
+
+
+class Command(BaseCommand):
+    help = "Keep one stock count per day (then per week) for old history and move the others to STOCK_ARCHIVE_DIR"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--daily-after', type=int, default=settings.STOCK_RETENTION_DAILY_DAYS,
+                            help='Age in days after which one count per day is kept (default: STOCK_RETENTION_DAILY_DAYS)')
+        parser.add_argument('--weekly-after', type=int, default=settings.STOCK_RETENTION_WEEKLY_DAYS,
+                            help='Age in days after which one count per week is kept (default: STOCK_RETENTION_WEEKLY_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be pruned')
+
+    def handle(self, *args, **options):
+        result = prune_count_history(
+            daily_after_days=options['daily_after'],
+            weekly_after_days=options['weekly_after'],
+            dry_run=options['dry_run']
+        )
+        if options['dry_run']:
+            self.stdout.write(f"Would archive {result['counts']} stock count(s) with {result['items']} item(s)")
+        else:
+            self.stdout.write(
+                f"Archived {result['counts']} stock count(s) with {result['items']} item(s) "
+                f"to {len(result['files'])} file(s)"
+            )
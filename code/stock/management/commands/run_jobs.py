@@ -0,0 +1,56 @@
+"""Run queued background jobs."""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from stock.jobs import claim_next_job, heartbeat_jobs, run_job
+from stock.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Claim and execute queued background jobs (counts, exports, imports, rebuilds)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker threads (default: 2)')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait between polls of an empty queue')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.stdout.write(f"Job worker started with {workers} thread(s)")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as executor:
+            running = {}
+            while True:
+                while len(running) < workers:
+                    job = claim_next_job()
+                    if job is None:
+                        break
+                    self.stdout.write(f"Running {job}")
+                    running[executor.submit(self._run, job)] = job.pk
+
+                if not running:
+                    if options['once']:
+                        break
+                    connection.close()
+                    time.sleep(options['poll'])
+                    continue
+
+                not_done = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED).not_done
+                running = {future: job_id for future, job_id in running.items() if future in not_done}
+                # This process is alive: renew the lease of its running jobs
+                heartbeat_jobs(list(running.values()))
+
+        self.stdout.write(self.style.SUCCESS('Job queue empty'))
+
+    def _run(self, job):
+        try:
+            run_job(job)
+            job.refresh_from_db(fields=['status', 'message'])
+            if job.status == Job.STATUS_FAILED:
+                self.stderr.write(f"Job {job.pk} failed: {job.message}")
+        finally:
+            # Each worker thread has its own connection
+            connection.close()
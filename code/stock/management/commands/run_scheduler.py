@@ -0,0 +1,30 @@
+"""Take automatic daily stock counts at each location's count time and purge expired idempotency keys."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from stock.utils import purge_expired_idempotency_keys, run_scheduled_counts
+
+
+class Command(BaseCommand):
+    help = "Save a daily stock count for every active location at its auto_count_time (default: AUTO_STOCK_COUNT_TIME)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between schedule checks (default: 60)')
+        parser.add_argument('--once', action='store_true', help='Take the counts that are due and exit (e.g. from cron)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            created, skipped = run_scheduled_counts()
+            if created or skipped:
+                self.stdout.write(
+                    f"Saved {len(created)} stock count(s) in {time.monotonic() - started:.2f}s, "
+                    f"skipped {len(skipped)} unchanged location(s)"
+                )
+            purge_expired_idempotency_keys()
+            if options['once']:
+                break
+            connection.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,59 @@
+"""Show the stock of locations at a point in time."""
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Location
+from stock.utils import get_stock_as_of, parse_moment, serialize_stock_as_of
+
+
+class Command(BaseCommand):
+    help = 'Show quantities and liters per location and beverage at a point in time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('at', help='ISO date or datetime, e.g. 2026-10-18T02:00 (local time zone if naive)')
+        parser.add_argument(
+            '--location',
+            type=int,
+            action='append',
+            dest='locations',
+            help='Location ID to include (repeatable, default: all active locations)'
+        )
+        parser.add_argument('--format', choices=['table', 'json', 'csv'], default='table')
+
+    def handle(self, *args, **options):
+        when = parse_moment(options['at'])
+        if when is None:
+            raise CommandError(f"Invalid date or datetime: {options['at']}")
+
+        if options['locations']:
+            locations = Location.objects.filter(id__in=options['locations'])
+        else:
+            locations = Location.objects.filter(is_active=True)
+
+        data = serialize_stock_as_of(get_stock_as_of(when, locations))
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps({'at': when.isoformat(), 'locations': data}, indent=2))
+        elif options['format'] == 'csv':
+            writer = csv.writer(self.stdout)
+            writer.writerow(['location_id', 'location', 'beverage_id', 'beverage', 'quantity', 'liters', 'source'])
+            for location in data:
+                for item in location['items']:
+                    writer.writerow([
+                        location['location_id'], location['location'],
+                        item['beverage_id'], item['beverage'],
+                        item['quantity'], item['liters'], item['source'],
+                    ])
+        else:
+            self.stdout.write(f"Stock as of {when:%Y-%m-%d %H:%M %Z}")
+            for location in data:
+                checkpoint = location['checkpoint_time'] or 'no count'
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"\n{location['location']} (last count: {checkpoint}, {location['total_liters']:.2f}L)"
+                ))
+                for item in location['items']:
+                    self.stdout.write(
+                        f"  {item['beverage']:<40} {item['quantity']:>10} {item['liters']:>10.2f}L  [{item['source']}]"
+                    )
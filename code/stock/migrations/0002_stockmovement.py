@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('set', 'Set'), ('adjust', 'Adjust')], max_length=10)),
+                ('delta', models.DecimalField(decimal_places=2, help_text='Change in units applied by this movement', max_digits=10)),
+                ('quantity', models.DecimalField(decimal_places=2, help_text='Number of units after this movement', max_digits=10)),
+                ('updated_by', models.CharField(blank=True, max_length=100)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='stock.stock')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['stock', 'timestamp'], name='stock_movement_stock_time')],
+            },
+        ),
+    ]
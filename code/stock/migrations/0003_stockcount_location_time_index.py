@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0002_stockmovement'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockcount',
+            index=models.Index(fields=['location', 'timestamp'], name='stock_count_location_time'),
+        ),
+    ]
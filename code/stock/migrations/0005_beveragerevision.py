@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_location_auto_count_time'),
+        ('stock', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BeverageRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_type_name', models.CharField(max_length=50)),
+                ('liters_per_unit', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('beverage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='inventory.beverage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('beverage', 'unit_type_name', 'liters_per_unit'), name='stock_beverage_revision_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='stockcountitem',
+            name='revision',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='count_items', to='stock.beveragerevision'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+def create_revisions(apps, schema_editor):
+    """Replace the values repeated on every count item with one revision per distinct value."""
+    BeverageRevision = apps.get_model('stock', 'BeverageRevision')
+    StockCountItem = apps.get_model('stock', 'StockCountItem')
+
+    values = (
+        StockCountItem.objects.order_by()
+        .values_list('beverage_id', 'unit_type_name', 'liters_per_unit')
+        .distinct()
+    )
+    BeverageRevision.objects.bulk_create([
+        BeverageRevision(beverage_id=beverage_id, unit_type_name=unit_type_name, liters_per_unit=liters_per_unit)
+        for beverage_id, unit_type_name, liters_per_unit in values
+    ], ignore_conflicts=True)
+
+    for revision in BeverageRevision.objects.all():
+        StockCountItem.objects.filter(
+            beverage_id=revision.beverage_id,
+            unit_type_name=revision.unit_type_name,
+            liters_per_unit=revision.liters_per_unit,
+            revision__isnull=True
+        ).update(revision=revision)
+
+
+def restore_values(apps, schema_editor):
+    BeverageRevision = apps.get_model('stock', 'BeverageRevision')
+    StockCountItem = apps.get_model('stock', 'StockCountItem')
+
+    for revision in BeverageRevision.objects.all():
+        StockCountItem.objects.filter(revision=revision).update(
+            unit_type_name=revision.unit_type_name,
+            liters_per_unit=revision.liters_per_unit
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0005_beveragerevision'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_revisions, restore_values),
+    ]
@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0006_deduplicate_count_item_revisions'),
+    ]
+
+    operations = [
+        # Defaults only matter when migrating backwards, where the columns are re-added
+        migrations.AlterField(
+            model_name='stockcountitem',
+            name='liters_per_unit',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='stockcountitem',
+            name='unit_type_name',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.RemoveField(
+            model_name='stockcountitem',
+            name='liters_per_unit',
+        ),
+        migrations.RemoveField(
+            model_name='stockcountitem',
+            name='unit_type_name',
+        ),
+        migrations.AlterField(
+            model_name='stockcountitem',
+            name='revision',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='count_items', to='stock.beveragerevision'),
+        ),
+    ]
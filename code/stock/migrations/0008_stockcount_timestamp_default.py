@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0007_remove_stockcountitem_denormalized_values'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockcount',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Moment the counted stock was read'),
+        ),
+    ]
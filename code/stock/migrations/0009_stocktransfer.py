@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_location_auto_count_time'),
+        ('stock', '0008_stockcount_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='kind',
+            field=models.CharField(choices=[('set', 'Set'), ('adjust', 'Adjust'), ('transfer', 'Transfer')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_by', models.CharField(blank=True, max_length=100)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers_in', to='inventory.location')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers_out', to='inventory.location')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_transfers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='transfer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='stock.stocktransfer'),
+        ),
+    ]
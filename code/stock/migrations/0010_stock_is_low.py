@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:21
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def flag_low_stock(apps, schema_editor):
+    """Flag existing stock below its alarm minimum and count it per location."""
+    Beverage = apps.get_model('inventory', 'Beverage')
+    Location = apps.get_model('inventory', 'Location')
+    Stock = apps.get_model('stock', 'Stock')
+
+    Stock.objects.filter(Exists(Beverage.objects.filter(
+        pk=OuterRef('beverage_id'),
+        is_active=True,
+        alarm_minimum__gt=OuterRef('quantity'),
+        available_locations=OuterRef('location_id')
+    ))).update(is_low=True)
+
+    low_count = (
+        Stock.objects.filter(location=OuterRef('pk'), is_low=True).order_by()
+        .values('location').annotate(low=Count('id')).values('low')
+    )
+    Location.objects.update(low_stock_count=Coalesce(Subquery(low_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_location_low_stock_count'),
+        ('stock', '0009_stocktransfer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='is_low',
+            field=models.BooleanField(default=False, editable=False, help_text="Below the beverage's alarm minimum (active beverages available at the location)"),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['location', 'is_low'], name='stock_location_low'),
+        ),
+        migrations.RunPython(flag_low_stock, migrations.RunPython.noop),
+    ]
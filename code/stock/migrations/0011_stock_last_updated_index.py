@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0010_stock_is_low'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['last_updated'], name='stock_last_updated'),
+        ),
+    ]
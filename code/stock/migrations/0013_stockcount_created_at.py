@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:36
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_existing_counts(apps, schema_editor):
+    """Existing counts were saved when they were read."""
+    StockCount = apps.get_model('stock', 'StockCount')
+    StockCount.objects.update(created_at=F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockcount',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Moment the count was saved'),
+        ),
+        migrations.RunPython(stamp_existing_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stockcount',
+            index=models.Index(fields=['created_at'], name='stock_count_created'),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from inventory.catalog import get_catalog
 from inventory.models import Location, Beverage
 
 
@@ -14,15 +17,27 @@ class Stock(models.Model):
     )
     last_updated = models.DateTimeField(auto_now=True)
     updated_by = models.CharField(max_length=100, blank=True)
+    is_low = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Below the beverage's alarm minimum (active beverages available at the location)"
+    )
 
     class Meta:
         ordering = ['location', 'beverage']
         unique_together = ['beverage', 'location']
+        indexes = [
+            models.Index(fields=['location', 'is_low'], name='stock_location_low'),
+            models.Index(fields=['last_updated'], name='stock_last_updated'),
+        ]
 
     @property
     def liters(self):
         """Calculate the total liters based on quantity, unit type quantity, and beverage's liters per unit."""
-        return float(self.quantity) * float(self.beverage.unit_type.quantity) * float(self.beverage.liters_per_unit)
+        factor = get_catalog().liters_factor(self.beverage_id)
+        if factor is None:
+            factor = float(self.beverage.unit_type.quantity) * float(self.beverage.liters_per_unit)
+        return float(self.quantity) * factor
 
     def __str__(self):
         return f"{self.beverage.name} at {self.location.name}: {self.quantity} units ({self.liters:.2f}L)"
@@ -31,10 +46,15 @@ class Stock(models.Model):
 class StockCount(models.Model):
     """Represents a saved count/snapshot of inventory at a location."""
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='counts')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, help_text="Moment the counted stock was read")
+    created_at = models.DateTimeField(default=timezone.now, editable=False, help_text="Moment the count was saved")
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['location', 'timestamp'], name='stock_count_location_time'),
+            models.Index(fields=['created_at'], name='stock_count_created'),
+        ]
 
     def __str__(self):
         return f"{self.location.name} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
@@ -45,6 +65,31 @@ class StockCount(models.Model):
         return sum(item.liters for item in self.items.all())
 
 
+class BeverageRevision(models.Model):
+    """Immutable unit type and liters per unit of a beverage, as used by stock counts.
+
+    Count items reference a revision instead of repeating these values on
+    every row. A new revision appears only when a beverage's unit type or
+    liters per unit change, so history keeps the values in effect at the
+    time of each count.
+    """
+    beverage = models.ForeignKey(Beverage, on_delete=models.CASCADE, related_name='revisions')
+    unit_type_name = models.CharField(max_length=50)
+    liters_per_unit = models.DecimalField(max_digits=10, decimal_places=3)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['beverage', 'unit_type_name', 'liters_per_unit'],
+                name='stock_beverage_revision_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.beverage_id}: {self.unit_type_name}, {self.liters_per_unit}L"
+
+
 class StockCountItem(models.Model):
     """Individual beverage quantities in a stock count."""
     stock_count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name='items')
@@ -59,11 +104,189 @@ class StockCountItem(models.Model):
         decimal_places=2,
         help_text="Total liters at time of count"
     )
-    unit_type_name = models.CharField(max_length=50)
-    liters_per_unit = models.DecimalField(max_digits=10, decimal_places=3)
+    revision = models.ForeignKey(BeverageRevision, on_delete=models.PROTECT, related_name='count_items')
 
     class Meta:
         ordering = ['beverage__name']
 
     def __str__(self):
         return f"{self.beverage.name}: {self.quantity} units ({self.liters}L)"
+
+    @property
+    def unit_type_name(self):
+        """Unit type of the beverage at the time of the count."""
+        return self.revision.unit_type_name
+
+    @property
+    def liters_per_unit(self):
+        """Liters per unit of the beverage at the time of the count."""
+        return self.revision.liters_per_unit
+
+
+class StockTransfer(models.Model):
+    """A batch of stock moved from one location to another in one transaction.
+
+    The transferred quantities are the transfer's movements: one negative
+    movement at the source and one positive movement at the destination for
+    every beverage.
+    """
+    source = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='transfers_out')
+    destination = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='transfers_in')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_transfers'
+    )
+    updated_by = models.CharField(max_length=100, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-timestamp', '-id']
+
+    def __str__(self):
+        return f"{self.source} -> {self.destination} ({self.timestamp:%Y-%m-%d %H:%M})"
+
+
+class StockMovement(models.Model):
+    """Append-only record of a single change to a stock quantity.
+
+    Each movement stores both the applied change and the resulting quantity,
+    so the state of a stock at any moment is the quantity of its last
+    movement before that moment. Stock counts act as periodic checkpoints:
+    reconstructing a location only needs the last count before a moment and
+    the movements after it.
+    """
+    KIND_SET = 'set'
+    KIND_ADJUST = 'adjust'
+    KIND_TRANSFER = 'transfer'
+    KIND_CHOICES = [
+        (KIND_SET, 'Set'),
+        (KIND_ADJUST, 'Adjust'),
+        (KIND_TRANSFER, 'Transfer'),
+    ]
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    delta = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Change in units applied by this movement"
+    )
+    quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Number of units after this movement"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements'
+    )
+    updated_by = models.CharField(max_length=100, blank=True)
+    transfer = models.ForeignKey(
+        StockTransfer,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movements'
+    )
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            models.Index(fields=['stock', 'timestamp'], name='stock_movement_stock_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock_id}: {self.delta:+} -> {self.quantity} ({self.timestamp:%Y-%m-%d %H:%M})"
+
+
+class Job(models.Model):
+    """A unit of background work executed by the ``run_jobs`` worker command."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text="Registered job handler name")
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last sign of life of the worker running the job"
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='stock_job_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @property
+    def percent(self):
+        """Progress in percent (0-100)."""
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, int(self.progress * 100 / self.total))
+
+
+class IdempotencyKey(models.Model):
+    """Key of a client operation that was applied, so that replays of it are not applied again.
+
+    Offline clients send every queued tap with a key of their own choosing;
+    the row is written in the same transaction as the operation and kept
+    until ``expires_at``.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='idempotency_keys'
+    )
+    result = models.JSONField(default=dict, blank=True, help_text="Outcome returned for replays")
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.key
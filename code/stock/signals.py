@@ -0,0 +1,47 @@
+"""Signal handlers keeping stock rows and low-stock flags in step with their inputs."""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from inventory.models import Beverage, Location
+from .models import Stock
+from .utils import recount_low_stock, refresh_low_stock
+
+
+@receiver(post_save, sender=Stock)
+def stock_saved(sender, instance, update_fields=None, **kwargs):
+    """Refresh the flag after full saves (admin edits, imports); stock writes keep it up to date themselves."""
+    if update_fields is None:
+        refresh_low_stock(location_ids=[instance.location_id], beverage_ids=[instance.beverage_id])
+
+
+@receiver(post_delete, sender=Stock)
+def stock_deleted(sender, instance, **kwargs):
+    """Drop a deleted low stock row from its location's counter."""
+    if instance.is_low:
+        recount_low_stock([instance.location_id])
+
+
+@receiver(post_save, sender=Beverage)
+def beverage_saved(sender, instance, created, **kwargs):
+    """Re-evaluate a beverage's stock when its alarm minimum or active state may have changed."""
+    if not created:
+        refresh_low_stock(beverage_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Beverage.available_locations.through)
+def beverage_locations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Create the stock rows of new assignments and re-evaluate stock when availability changes."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Location):
+        pairs = [(beverage_id, instance.pk) for beverage_id in pk_set or ()]
+        refresh = {'location_ids': [instance.pk], 'beverage_ids': pk_set}
+    else:
+        pairs = [(instance.pk, location_id) for location_id in pk_set or ()]
+        refresh = {'beverage_ids': [instance.pk], 'location_ids': pk_set}
+    if action == 'post_add' and pairs:
+        Stock.objects.bulk_create(
+            [Stock(beverage_id=beverage_id, location_id=location_id, quantity=0) for beverage_id, location_id in pairs],
+            ignore_conflicts=True
+        )
+    refresh_low_stock(**refresh)
@@ -204,3 +204,453 @@ function formatCrossingDate(date) {
     const minutes = String(date.getMinutes()).padStart(2, '0');
     return `${day}/${month} ${hours}:${minutes}`;
 }
+
+/**
+ * Convert an rgb() color into a translucent rgba() fill color
+ * @param {string} color - Color in rgb() notation
+ * @returns {string} - Same color with 0.1 alpha
+ */
+function translucentColor(color) {
+    return color.replace('rgb', 'rgba').replace(')', ', 0.1)');
+}
+
+/**
+ * Shared time axis configuration for stock charts
+ * @returns {Object} - Chart.js scale options for the x axis
+ */
+function timeAxisOptions() {
+    return {
+        type: 'time',
+        time: {
+            unit: 'hour',
+            displayFormats: {
+                hour: 'dd/MM HH:mm'
+            },
+            tooltipFormat: 'dd/MM HH:mm'
+        },
+        adapters: {
+            date: {
+                zone: 'local'
+            }
+        },
+        ticks: {
+            maxRotation: 45,
+            minRotation: 45,
+            font: {
+                size: 10
+            }
+        },
+        grid: {
+            display: true,
+            color: 'rgba(0, 0, 0, 0.05)'
+        }
+    };
+}
+
+/**
+ * Create the card holding a single beverage chart
+ * @param {Object} beverage - Beverage chart data (id, name, unit_type)
+ * @returns {HTMLElement} - Grid column containing the card
+ */
+function createBeverageCard(beverage) {
+    const column = document.createElement('div');
+    column.className = 'col-md-6 mb-4';
+
+    const card = document.createElement('div');
+    card.className = 'card';
+    card.id = 'card-' + beverage.id;
+
+    const body = document.createElement('div');
+    body.className = 'card-body';
+
+    const title = document.createElement('h6');
+    title.className = 'card-title';
+    title.textContent = beverage.name + ' (' + beverage.unit_type + ') ';
+
+    const trend = document.createElement('span');
+    trend.id = 'trend-' + beverage.id;
+    trend.className = 'ms-2';
+    title.appendChild(trend);
+
+    const container = document.createElement('div');
+    container.className = 'chart-container';
+    const canvas = document.createElement('canvas');
+    canvas.id = 'chart-' + beverage.id;
+    container.appendChild(canvas);
+
+    body.appendChild(title);
+    body.appendChild(container);
+    card.appendChild(body);
+    column.appendChild(card);
+    return column;
+}
+
+/**
+ * Render the time series chart, trend indicator and alarm highlight for one beverage
+ * @param {Object} data - Beverage chart data (labels, data, alarm_minimum, color, name)
+ * @param {HTMLElement} card - Card element created by createBeverageCard
+ */
+function renderBeverageChart(data, card) {
+    if (!data || !data.labels || data.labels.length === 0) return;
+
+    const alarmMin = data.alarm_minimum || 0;
+    const beverageColor = data.color || 'rgb(54, 162, 235)';
+    const trendResult = calculateTrendline(data.data, data.labels, alarmMin);
+
+    // Calculate average minutes between counts for future predictions
+    const avgMinutes = trendResult.extendedLabels.length > data.labels.length ? 15 : 30;
+
+    // Convert labels to timestamps for time scale
+    const timestamps = createTimestampsWithPredictions(
+        trendResult.extendedLabels,
+        data.labels[data.labels.length - 1],
+        avgMinutes
+    );
+
+    // Convert data to {x, y} format for time scale
+    const quantityData = trendResult.extendedLabels.map((label, index) => {
+        const value = index < data.data.length ? data.data[index] : null;
+        return value !== null ? { x: timestamps[index], y: value } : null;
+    }).filter(point => point !== null);
+
+    const trendData = timestamps.map((timestamp, index) => ({
+        x: timestamp,
+        y: trendResult.trendline[index]
+    }));
+
+    const datasets = [{
+        label: data.name,
+        data: quantityData,
+        borderColor: beverageColor,
+        backgroundColor: translucentColor(beverageColor),
+        tension: 0.4,
+        fill: true,
+        order: 2,
+        spanGaps: false
+    }, {
+        label: 'Trend',
+        data: trendData,
+        borderColor: 'rgba(54, 162, 235, 0.5)',
+        borderDash: [5, 5],
+        borderWidth: 2,
+        fill: false,
+        tension: 0,
+        pointRadius: 0,
+        order: 1
+    }];
+
+    // Add crossing point markers if they exist
+    const crossingAnnotations = {};
+    if (trendResult.crossingPoints && trendResult.crossingPoints.length > 0) {
+        const crossingData = trendResult.crossingPoints.map(crossing => {
+            const index = Math.round(crossing.index);
+            if (index >= 0 && index < timestamps.length) {
+                return { x: timestamps[index], y: crossing.value };
+            }
+            return null;
+        }).filter(point => point !== null);
+
+        datasets.push({
+            label: 'Alert Crossing',
+            data: crossingData,
+            borderColor: 'rgba(255, 0, 0, 0.8)',
+            backgroundColor: 'rgba(255, 0, 0, 0.8)',
+            pointRadius: 8,
+            pointStyle: 'triangle',
+            showLine: false,
+            order: 0
+        });
+
+        // Create annotations for crossing point labels
+        trendResult.crossingPoints.forEach((crossing, idx) => {
+            const index = Math.round(crossing.index);
+            if (index >= 0 && index < timestamps.length) {
+                const timestamp = timestamps[index];
+                crossingAnnotations[`crossing${idx}`] = {
+                    type: 'label',
+                    xValue: timestamp,
+                    yValue: crossing.value,
+                    backgroundColor: 'rgba(255, 0, 0, 0.9)',
+                    color: 'white',
+                    content: formatCrossingDate(timestamp),
+                    font: {
+                        size: 10,
+                        weight: 'bold'
+                    },
+                    padding: 4,
+                    borderRadius: 3,
+                    yAdjust: -20
+                };
+            }
+        });
+    }
+
+    const ctx = card.querySelector('canvas').getContext('2d');
+    new Chart(ctx, {
+        type: 'line',
+        data: {
+            datasets: datasets
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                annotation: {
+                    annotations: {
+                        alarmZone: {
+                            type: 'box',
+                            yMin: 0,
+                            yMax: alarmMin,
+                            backgroundColor: 'rgba(255, 0, 0, 0.1)',
+                            borderColor: 'rgba(255, 0, 0, 0.3)',
+                            borderWidth: 1,
+                            label: {
+                                display: true,
+                                content: 'Low Stock Zone',
+                                position: 'start',
+                                color: 'rgba(255, 0, 0, 0.8)',
+                                font: {
+                                    size: 10
+                                }
+                            }
+                        },
+                        alarmLine: {
+                            type: 'line',
+                            yMin: alarmMin,
+                            yMax: alarmMin,
+                            borderColor: 'rgba(255, 0, 0, 0.5)',
+                            borderWidth: 2,
+                            borderDash: [6, 6]
+                        },
+                        nowLine: {
+                            type: 'line',
+                            xMin: new Date(),
+                            xMax: new Date(),
+                            borderColor: 'rgba(0, 0, 0, 0.5)',
+                            borderWidth: 2,
+                            borderDash: [3, 3],
+                            label: {
+                                display: true,
+                                content: 'Now',
+                                position: 'start',
+                                backgroundColor: 'rgba(0, 0, 0, 0.7)',
+                                color: 'white',
+                                font: {
+                                    size: 10
+                                }
+                            }
+                        },
+                        ...crossingAnnotations
+                    }
+                },
+                legend: {
+                    display: true,
+                    position: 'top',
+                    labels: {
+                        usePointStyle: true,
+                        padding: 10,
+                        font: {
+                            size: 11
+                        }
+                    }
+                },
+                title: {
+                    display: false
+                }
+            },
+            scales: {
+                x: timeAxisOptions(),
+                y: {
+                    beginAtZero: true,
+                    ticks: {
+                        stepSize: 1
+                    }
+                }
+            }
+        }
+    });
+
+    // Add trend direction indicator
+    const trendSpan = card.querySelector('#trend-' + data.id);
+    if (trendResult.trendDirection === 'down') {
+        trendSpan.innerHTML = '<i class="bi bi-arrow-down-circle-fill text-danger" title="Decreasing"></i>';
+    } else if (trendResult.trendDirection === 'up') {
+        trendSpan.innerHTML = '<i class="bi bi-arrow-up-circle-fill text-success" title="Increasing"></i>';
+    } else {
+        trendSpan.innerHTML = '<i class="bi bi-dash-circle-fill text-secondary" title="Stable"></i>';
+    }
+
+    // Highlight the card if current stock is below alarm minimum
+    const currentQuantity = data.data[data.data.length - 1];
+    if (currentQuantity < alarmMin) {
+        card.style.backgroundColor = 'rgba(220, 53, 69, 0.1)';
+        card.style.borderColor = '#dc3545';
+        card.style.borderWidth = '2px';
+    }
+}
+
+/**
+ * Render the combined chart: the location's total liters per count
+ * @param {HTMLCanvasElement} canvas - Canvas for the combined chart
+ * @param {Object} payload - Total liters payload with delta-encoded epoch timestamps
+ */
+function renderCombinedChart(canvas, payload) {
+    const color = 'rgb(54, 162, 235)';
+    const datasets = [{
+        label: 'Total liters',
+        data: createTimeSeriesData(decodeTimestamps(payload.timestamps), payload.total_liters),
+        borderColor: color,
+        backgroundColor: translucentColor(color),
+        tension: 0.4,
+        fill: true,
+        borderWidth: 2,
+        pointRadius: 3,
+        pointHoverRadius: 5
+    }];
+
+    new Chart(canvas.getContext('2d'), {
+        type: 'line',
+        data: {
+            datasets: datasets
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            interaction: {
+                mode: 'index',
+                intersect: false
+            },
+            plugins: {
+                legend: {
+                    display: true,
+                    position: 'top',
+                    labels: {
+                        usePointStyle: true,
+                        padding: 15,
+                        font: {
+                            size: 12
+                        }
+                    }
+                },
+                title: {
+                    display: false
+                },
+                tooltip: {
+                    mode: 'index',
+                    intersect: false
+                }
+            },
+            scales: {
+                x: timeAxisOptions(),
+                y: {
+                    beginAtZero: true,
+                    title: {
+                        display: true,
+                        text: 'Liters',
+                        font: {
+                            size: 12
+                        }
+                    },
+                    ticks: {
+                        callback: function(value) {
+                            return value.toFixed(2) + 'L';
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+/**
+ * Decode delta-encoded epoch timestamps of a chart payload
+ * @param {Array<number>} timestamps - First epoch second, then seconds since the previous point
+ * @returns {Array<string>} - ISO labels
+ */
+function decodeTimestamps(timestamps) {
+    let seconds = 0;
+    return timestamps.map(delta => {
+        seconds += delta;
+        return new Date(seconds * 1000).toISOString();
+    });
+}
+
+/**
+ * Decode the compact columnar chart payload served by the chart data endpoint
+ * @param {Object} payload - Payload with delta-encoded epoch timestamps, beverages and series
+ * @returns {Array<Object>} - Beverage chart data with ISO labels and quantity data
+ */
+function decodeChartPayload(payload) {
+    const labels = decodeTimestamps(payload.timestamps);
+
+    return payload.beverages.map((beverage, index) => Object.assign({}, beverage, {
+        labels: labels,
+        data: payload.series[index]
+    }));
+}
+
+/**
+ * Number of beverage series requested per lazy chart request
+ */
+const CHART_BATCH_SIZE = 20;
+
+/**
+ * Create beverage cards and render each chart only once it scrolls into view
+ * @param {string} url - Chart data endpoint for the location
+ * @param {HTMLCanvasElement} combinedCanvas - Canvas for the combined chart
+ * @param {HTMLElement} container - Row that receives the beverage cards
+ * @returns {Promise} - Resolves once the cards have been created
+ */
+function loadStockChartsLazily(url, combinedCanvas, container) {
+    // The URL may already carry a date range
+    const separator = url.includes('?') ? '&' : '?';
+    const fetchPayload = (query) => fetch(url + (query ? separator + query : ''), { credentials: 'same-origin' })
+        .then(response => {
+            if (!response.ok) throw new Error('Chart data request failed: ' + response.status);
+            return response.json();
+        });
+
+    // The combined chart is one server-side total, whatever the number of beverages
+    fetchPayload('series=total')
+        .then(payload => renderCombinedChart(combinedCanvas, payload))
+        .catch(error => console.error('Error loading chart data:', error));
+
+    return fetchPayload('series=0').then(meta => {
+        const cards = {};
+        let pending = [];
+        let timer = null;
+
+        // Request the series of all cards that became visible in one go
+        const flush = () => {
+            timer = null;
+            while (pending.length > 0) {
+                const batch = pending.splice(0, CHART_BATCH_SIZE);
+                fetchPayload('beverages=' + batch.join(','))
+                    .then(payload => decodeChartPayload(payload).forEach(data => {
+                        renderBeverageChart(data, cards[data.id]);
+                    }))
+                    .catch(error => console.error('Error loading chart data:', error));
+            }
+        };
+
+        const observer = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (!entry.isIntersecting) return;
+                observer.unobserve(entry.target);
+                pending.push(entry.target.dataset.beverageId);
+            });
+            if (pending.length > 0 && timer === null) {
+                timer = setTimeout(flush, 50);
+            }
+        }, { rootMargin: '200px' });
+
+        meta.beverages.forEach(beverage => {
+            const column = createBeverageCard(beverage);
+            container.appendChild(column);
+            const card = column.querySelector('.card');
+            card.dataset.beverageId = beverage.id;
+            cards[beverage.id] = card;
+            observer.observe(card);
+        });
+    });
+}
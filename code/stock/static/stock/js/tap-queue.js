@@ -0,0 +1,218 @@
+/**
+ * Offline-first queue for quick stock adjustments
+ *
+ * Taps on the +/- buttons update the row at once and are stored in
+ * IndexedDB, each with its own idempotency key. The queue is sent to the
+ * batch endpoint in the background and again whenever the connection comes
+ * back, so a tap is never lost and never blocks on the network. The server
+ * applies every key at most once, so re-sending a batch after a lost
+ * response is safe.
+ */
+
+const TAP_DB_NAME = 'bar-inventory';
+const TAP_STORE = 'taps';
+
+/**
+ * Delay before retrying a failed flush (doubles up to the maximum)
+ */
+const TAP_RETRY_DELAY = 2000;
+const TAP_RETRY_MAX_DELAY = 60000;
+
+/**
+ * Number of queued taps sent per batch request (server limit: 200)
+ */
+const TAP_BATCH_SIZE = 100;
+
+/**
+ * Create a random idempotency key
+ * @returns {string} - Key of at most 64 characters
+ */
+function createTapKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
+/**
+ * Open the tap store; resolves to null where IndexedDB is unavailable
+ * @returns {Promise<IDBDatabase|null>}
+ */
+function openTapStore() {
+    return new Promise(resolve => {
+        if (!window.indexedDB) return resolve(null);
+        const request = indexedDB.open(TAP_DB_NAME, 1);
+        request.onupgradeneeded = () => {
+            request.result.createObjectStore(TAP_STORE, { keyPath: 'key' });
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => resolve(null);
+    });
+}
+
+/**
+ * Run one IndexedDB request in a transaction on the tap store
+ * @param {IDBDatabase} db - Open database
+ * @param {string} mode - 'readonly' or 'readwrite'
+ * @param {Function} action - Receives the object store, returns an IDBRequest
+ * @returns {Promise} - Resolves with the request result once the transaction completes
+ */
+function tapStoreRequest(db, mode, action) {
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(TAP_STORE, mode);
+        const request = action(transaction.objectStore(TAP_STORE));
+        transaction.oncomplete = () => resolve(request.result);
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+/**
+ * Format liters like the floor_decimal:2 template filter
+ * @param {number} liters
+ * @returns {string}
+ */
+function formatTapLiters(liters) {
+    return (Math.floor(liters * 100 + 1e-9) / 100).toFixed(2);
+}
+
+/**
+ * Create the tap queue for a location page
+ * @param {Object} options - batchUrl, csrfToken, container (element holding the stock rows), status (element for the queue state)
+ * @returns {Object} - Queue with enqueue() and flush()
+ */
+function createTapQueue(options) {
+    const dbReady = openTapStore();
+    const memory = new Map();   // Fallback store without IndexedDB
+    let flushing = null;
+    let retryDelay = TAP_RETRY_DELAY;
+    let retryTimer = null;
+
+    const all = () => dbReady.then(db => db
+        ? tapStoreRequest(db, 'readonly', store => store.getAll())
+        : Array.from(memory.values()));
+    const put = (tap) => dbReady.then(db => db
+        ? tapStoreRequest(db, 'readwrite', store => store.put(tap))
+        : memory.set(tap.key, tap));
+    const remove = (keys) => dbReady.then(db => db
+        ? Promise.all(keys.map(key => tapStoreRequest(db, 'readwrite', store => store.delete(key))))
+        : keys.forEach(key => memory.delete(key)));
+
+    const showStatus = (pending, offline) => {
+        if (!options.status) return;
+        options.status.hidden = pending === 0;
+        options.status.textContent = pending === 0 ? ''
+            : pending + (pending === 1 ? ' tap' : ' taps') + (offline ? ' waiting for connection' : ' syncing');
+    };
+
+    const rowParts = (stockId) => {
+        const row = options.container.querySelector('[data-stock-id="' + stockId + '"]');
+        return row ? {
+            row: row,
+            quantity: row.querySelector('.quantity-display'),
+            liters: row.querySelector('.liters-value')
+        } : null;
+    };
+
+    const showQuantity = (stockId, quantity, liters) => {
+        const parts = rowParts(stockId);
+        if (!parts) return;
+        parts.row.dataset.quantity = quantity;
+        parts.quantity.textContent = Math.round(quantity);
+        if (parts.liters) parts.liters.textContent = formatTapLiters(liters);
+    };
+
+    const scheduleRetry = () => {
+        if (retryTimer !== null) return;
+        retryTimer = setTimeout(() => {
+            retryTimer = null;
+            flush();
+        }, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, TAP_RETRY_MAX_DELAY);
+    };
+
+    /**
+     * Send a batch of queued taps to the server
+     * @returns {Promise} - Resolves once the batch is acknowledged and removed from the queue
+     */
+    const sendNext = () => all().then(taps => {
+        if (taps.length === 0) return;
+        taps.sort((a, b) => a.createdAt - b.createdAt);
+        const batch = taps.slice(0, TAP_BATCH_SIZE);
+        return fetch(options.batchUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': options.csrfToken },
+            body: JSON.stringify({
+                operations: batch.map(tap => ({ key: tap.key, stock: tap.stock, adjustment: tap.adjustment }))
+            })
+        }).then(response => {
+            if (!response.ok) throw new Error('Tap sync failed: ' + response.status);
+            return response.json();
+        }).then(payload => {
+            payload.results.forEach(result => {
+                if (result.status === 'error') console.warn('Tap rejected:', result.error);
+            });
+            return remove(payload.results.map(result => result.key)).then(all).then(rest => {
+                // Show server quantities for rows without taps still queued
+                const pending = new Set(rest.map(tap => String(tap.stock)));
+                Object.entries(payload.stocks).forEach(([stockId, current]) => {
+                    if (!pending.has(stockId)) showQuantity(stockId, current.quantity, current.liters);
+                });
+                retryDelay = TAP_RETRY_DELAY;
+                if (rest.length > 0) return sendNext();
+            });
+        });
+    });
+
+    /**
+     * Send all queued taps; taps stay queued until the server acknowledged them
+     * @returns {Promise}
+     */
+    function flush() {
+        if (flushing) return flushing;
+        flushing = sendNext().catch(error => {
+            console.warn(error);
+            scheduleRetry();
+        }).finally(() => {
+            flushing = null;
+            all().then(taps => {
+                showStatus(taps.length, !navigator.onLine);
+                // Taps queued while the last batch was in flight
+                if (taps.length > 0) scheduleRetry();
+            });
+        });
+        return flushing;
+    }
+
+    /**
+     * Apply a tap to the row at once and queue it for the server
+     * @param {string} stockId - Stock row ID
+     * @param {number} adjustment - Amount added (negative to remove)
+     */
+    function enqueue(stockId, adjustment) {
+        const parts = rowParts(stockId);
+        if (parts) {
+            const quantity = Math.max(0, parseFloat(parts.row.dataset.quantity) + adjustment);
+            showQuantity(stockId, quantity, quantity * parseFloat(parts.row.dataset.litersFactor));
+        }
+        return put({ key: createTapKey(), stock: stockId, adjustment: String(adjustment), createdAt: Date.now() })
+            .then(() => all())
+            .then(taps => showStatus(taps.length, !navigator.onLine))
+            .then(flush);
+    }
+
+    options.container.addEventListener('click', event => {
+        const button = event.target.closest('[data-adjustment]');
+        if (!button || !options.container.contains(button)) return;
+        event.preventDefault();
+        const row = button.closest('[data-stock-id]');
+        enqueue(row.dataset.stockId, parseFloat(button.dataset.adjustment));
+    });
+
+    window.addEventListener('online', () => {
+        retryDelay = TAP_RETRY_DELAY;
+        flush();
+    });
+
+    // Taps left from an earlier visit are sent right away
+    flush();
+    return { enqueue: enqueue, flush: flush };
+}
@@ -0,0 +1,117 @@
+import random
+import threading
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Beverage, Location, UnitType
+
+from .models import Stock, StockCount, StockMovement
+from .utils import adjust_stock_quantity, create_stock_count, get_stock_as_of
+
+
+class StockAsOfAdminEditTests(TestCase):
+    """Point-in-time stock after quantities are edited in the admin."""
+
+    def setUp(self):
+        unit_type = UnitType.objects.create(name='BARREL', quantity=1)
+        self.location = Location.objects.create(name='Main Bar')
+        self.beverage = Beverage.objects.create(name='Beer', unit_type=unit_type, liters_per_unit='20')
+        self.beverage.available_locations.add(self.location)
+        self.stock = Stock.objects.get(location=self.location, beverage=self.beverage)
+        adjust_stock_quantity(self.stock, 3)
+        self.client.force_login(User.objects.create_superuser('staff', password='secret'))
+
+    def _quantity_as_of(self, when):
+        [result] = get_stock_as_of(when, locations=[self.location])
+        return {item['beverage'].id: (item['quantity'], item['source']) for item in result['items']}[self.beverage.id]
+
+    def test_admin_edit_is_seen_after_the_count(self):
+        stock_count = create_stock_count(self.location)
+
+        response = self.client.post(reverse('admin:stock_stock_change', args=[self.stock.id]), {
+            'beverage': self.beverage.id,
+            'location': self.location.id,
+            'quantity': '8',
+            'updated_by': '',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        movement = StockMovement.objects.filter(stock=self.stock).latest('id')
+        self.assertEqual((movement.kind, movement.delta, movement.quantity), (StockMovement.KIND_SET, 5, 8))
+        self.assertEqual(self._quantity_as_of(timezone.now()), (Decimal('8'), 'movement'))
+        self.assertEqual(self._quantity_as_of(stock_count.timestamp), (Decimal('3'), 'count'))
+
+
+class SaveCountConcurrencyTests(TransactionTestCase):
+    """Stock counts saved while taps are being written."""
+
+    TAPPERS = 4
+    TAPS_PER_TAPPER = 25
+    COUNTS = 10
+
+    def setUp(self):
+        unit_type = UnitType.objects.create(name='TRAY_6', quantity=6)
+        self.location = Location.objects.create(name='Main Bar')
+        for name in ['Cola', 'Beer', 'Water']:
+            beverage = Beverage.objects.create(name=name, unit_type=unit_type, liters_per_unit='0.330')
+            beverage.available_locations.add(self.location)
+        self.stocks = list(Stock.objects.filter(location=self.location))
+        User.objects.create_superuser('staff', password='secret')
+
+    def _run_in_thread(self, work, errors):
+        def target():
+            try:
+                work()
+            except Exception as e:  # reported by the test thread
+                errors.append(e)
+            finally:
+                connection.close()
+        return threading.Thread(target=target)
+
+    def _tap(self):
+        rng = random.Random()
+        for _ in range(self.TAPS_PER_TAPPER):
+            adjust_stock_quantity(rng.choice(self.stocks), 1, updated_by='Tapper')
+
+    def _save_counts(self):
+        client = Client()
+        client.login(username='staff', password='secret')
+        url = reverse('stock:save_count', args=[self.location.id])
+        for _ in range(self.COUNTS):
+            response = client.post(url)
+            self.assertEqual(response.status_code, 302)
+
+    def test_counts_match_one_ledger_state(self):
+        errors = []
+        threads = [self._run_in_thread(self._tap, errors) for _ in range(self.TAPPERS)]
+        threads.append(self._run_in_thread(self._save_counts, errors))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        movements = list(StockMovement.objects.order_by('timestamp', 'id'))
+        self.assertEqual(len(movements), self.TAPPERS * self.TAPS_PER_TAPPER)
+
+        counts = StockCount.objects.filter(location=self.location).prefetch_related('items')
+        self.assertEqual(len(counts), self.COUNTS)
+        for stock_count in counts:
+            # Replay the ledger up to the moment the count was taken
+            expected = {stock.beverage_id: Decimal('0') for stock in self.stocks}
+            beverage_ids = {stock.pk: stock.beverage_id for stock in self.stocks}
+            for movement in movements:
+                if movement.timestamp > stock_count.timestamp:
+                    break
+                expected[beverage_ids[movement.stock_id]] = movement.quantity
+            counted = {item.beverage_id: item.quantity for item in stock_count.items.all()}
+            self.assertEqual(counted, expected)
+
+        # Every tap landed on top of the one before it
+        for stock in Stock.objects.filter(location=self.location):
+            self.assertEqual(stock.quantity, sum(m.delta for m in movements if m.stock_id == stock.pk))
@@ -6,8 +6,22 @@ app_name = 'stock'
 urlpatterns = [
     path('stock/overview/', views.stock_overview, name='overview'),
     path('stock/overview/<int:location_id>/', views.stock_overview, name='overview_location'),
+    path('stock/overview/<int:location_id>/chart-data/', views.chart_data, name='chart_data'),
     path('location/<int:location_id>/', views.location_detail, name='location_detail'),
+    path('location/<int:location_id>/stock/', views.location_stock, name='location_stock'),
     path('stock/<int:stock_id>/update/', views.update_stock, name='update_stock'),
     path('stock/<int:stock_id>/adjust/', views.quick_adjust, name='quick_adjust'),
+    path('stock/adjust/batch/', views.adjust_batch, name='adjust_batch'),
     path('location/<int:location_id>/save-count/', views.save_count, name='save_count'),
+    path('stock/transfer/', views.transfer, name='transfer'),
+    path('stock/matrix/', views.stock_matrix, name='stock_matrix'),
+    path('stock/as-of/', views.stock_as_of, name='stock_as_of'),
+    path('stock/counts/history/<int:location_id>/', views.count_history, name='count_history'),
+    path('stock/counts/diff/', views.count_diff, name='count_diff'),
+    path('stock/counts/reconcile/', views.reconcile_counts, name='reconcile_counts'),
+    path('stock/counts/snapshot/', views.snapshot_counts, name='snapshot_counts'),
+    path('api/v1/stock/changes/', views.stock_changes, name='stock_changes'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/progress/', views.job_progress, name='job_progress'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
 ]
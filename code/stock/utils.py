@@ -1,10 +1,69 @@
 """Utility functions for stock management."""
 from decimal import Decimal
-from django.db.models.functions import Lower
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, QuerySet, Subquery
 from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import title
+from bar_inventory.sqlite import immediate_atomic, retry_on_database_locked
+from inventory.catalog import get_catalog
 from inventory.models import Location, Beverage
 
 
+def get_location_stock_summaries(locations):
+    """
+    Calculate stock summaries for many locations in one query.
+
+    Item counts, total liters and the last stock update are aggregated over
+    each location's stock of active beverages; the last count time is a
+    correlated lookup on the (location, timestamp) count index.
+
+    Args:
+        locations: QuerySet or list of Location objects
+
+    Returns:
+        list: One summary dict per location with location, beverage_count,
+            item_count, total_liters, last_updated and last_count_at
+    """
+    from django.db.models import Count, DecimalField, F, Max, Q, Sum
+    from .models import StockCount
+
+    if isinstance(locations, QuerySet):
+        queryset = locations
+    else:
+        locations = list(locations)
+        queryset = Location.objects.filter(pk__in=[location.pk for location in locations])
+
+    active = Q(stock__beverage__is_active=True)
+    last_count = StockCount.objects.filter(location=OuterRef('pk')).order_by('-timestamp').values('timestamp')[:1]
+    annotated = queryset.annotate(
+        item_count=Count('stock', filter=active),
+        total_liters=Sum(
+            F('stock__quantity') * F('stock__beverage__liters_per_unit') * F('stock__beverage__unit_type__quantity'),
+            filter=active,
+            output_field=DecimalField(max_digits=20, decimal_places=5)
+        ),
+        last_updated=Max('stock__last_updated', filter=active),
+        last_count_at=Subquery(last_count),
+    )
+    if not isinstance(locations, QuerySet):
+        by_id = {location.pk: location for location in annotated}
+        annotated = [by_id[location.pk] for location in locations if location.pk in by_id]
+
+    catalog = get_catalog()
+    return [
+        {
+            'location': location,
+            'beverage_count': len(catalog.beverages_for_location(location.pk)),
+            'item_count': location.item_count,
+            'total_liters': float(location.total_liters or 0),
+            'last_updated': location.last_updated,
+            'last_count_at': location.last_count_at,
+        }
+        for location in annotated
+    ]
+
+
 def get_location_stock_summary(location):
     """
     Calculate stock summary for a location.
@@ -13,153 +72,1597 @@ def get_location_stock_summary(location):
         location: Location object
 
     Returns:
-        dict: Summary with item_count and total_liters
+        dict: Summary with beverage_count, item_count, total_liters, last_updated and last_count_at
+    """
+    summaries = get_location_stock_summaries([location])
+    if summaries:
+        return summaries[0]
+    # The location is gone from the database (e.g. deleted while the page was open)
+    return {
+        'location': location,
+        'beverage_count': 0,
+        'item_count': 0,
+        'total_liters': 0.0,
+        'last_updated': None,
+        'last_count_at': None,
+    }
+
+
+def compact_number(value):
+    """Return a Decimal as an int when it is integral, otherwise as a float."""
+    if value == value.to_integral_value():
+        return int(value)
+    return float(value)
+
+
+def get_stock_matrix(locations=None):
+    """
+    Current stock of every active beverage at every location, as a pivot table.
+
+    One query reads the (location, beverage, quantity) triples of the stock
+    table; unit data comes from the catalog. Cells are positional: row ``i``
+    of ``quantities`` and ``liters`` belongs to ``beverages[i]`` and holds one
+    value per entry of ``locations`` (None where the location has no stock
+    row for the beverage).
+
+    Args:
+        locations: Optional QuerySet or list of locations (default: all active locations)
+
+    Returns:
+        dict: Matrix with locations, beverages, quantities, liters, row totals
+            (beverage_quantities, beverage_liters), column totals
+            (location_liters) and total_liters
     """
     from .models import Stock
 
-    stocks = Stock.objects.filter(location=location, beverage__is_active=True)
-    item_count = stocks.count()
-    total_liters = sum(stock.liters for stock in stocks)
+    if locations is None:
+        locations = Location.objects.filter(is_active=True)
+    locations = list(locations)
+    column = {location.pk: index for index, location in enumerate(locations)}
+
+    catalog = get_catalog()
+    offered = set()
+    for location in locations:
+        offered.update(beverage.id for beverage in catalog.beverages_for_location(location.pk))
+    beverages = [beverage for beverage in catalog.active_beverages if beverage.id in offered]
+    row = {beverage.id: index for index, beverage in enumerate(beverages)}
 
+    quantities = [[None] * len(locations) for _ in beverages]
+    liters = [[None] * len(locations) for _ in beverages]
+    beverage_quantities = [Decimal('0')] * len(beverages)
+    for location_id, beverage_id, quantity in (
+            Stock.objects.filter(location_id__in=column, beverage_id__in=row)
+            .order_by().values_list('location_id', 'beverage_id', 'quantity')):
+        i, j = row[beverage_id], column[location_id]
+        quantities[i][j] = compact_number(quantity)
+        liters[i][j] = round(float(quantity) * beverages[i].liters_factor, 3)
+        beverage_quantities[i] += quantity
+
+    beverage_liters = [round(sum(value for value in values if value is not None), 3) for values in liters]
+    location_liters = [
+        round(sum(values[j] for values in liters if values[j] is not None), 3)
+        for j in range(len(locations))
+    ]
     return {
-        'location': location,
-        'item_count': item_count,
-        'total_liters': total_liters
+        'locations': locations,
+        'beverages': beverages,
+        'quantities': quantities,
+        'liters': liters,
+        'beverage_quantities': [compact_number(quantity) for quantity in beverage_quantities],
+        'beverage_liters': beverage_liters,
+        'location_liters': location_liters,
+        'total_liters': round(sum(location_liters), 3),
     }
 
 
-def prepare_chart_data_for_location(location, recent_counts):
+CHANGES_CURSOR_VERSION = 1
+
+
+def _changes_position(moment, pk):
+    """Cursor position of a row: epoch microseconds of its change and its id."""
+    return (int(moment.timestamp()) * 1_000_000 + moment.microsecond, pk)
+
+
+def encode_changes_cursor(stock_position, count_position):
+    """
+    Encode the positions of a changes feed into an opaque cursor.
+
+    Args:
+        stock_position: (epoch microseconds, id) of the last stock row sent
+        count_position: (epoch microseconds, id) of the last stock count sent
+
+    Returns:
+        str: URL-safe cursor
+    """
+    from base64 import urlsafe_b64encode
+
+    raw = '.'.join(str(value) for value in (CHANGES_CURSOR_VERSION, *stock_position, *count_position))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_changes_cursor(cursor):
     """
-    Prepare chart data for beverages at a location.
+    Decode a cursor made by encode_changes_cursor.
+
+    Args:
+        cursor: Cursor string (empty for the start of the feed)
+
+    Returns:
+        tuple: (stock_position, count_position)
+
+    Raises:
+        ValueError: If the cursor is malformed or from another version
+    """
+    from base64 import urlsafe_b64decode
+    from binascii import Error as Base64Error
+
+    if not cursor:
+        return (0, 0), (0, 0)
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        values = [int(value) for value in raw.split('.')]
+    except (Base64Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if len(values) != 5 or values[0] != CHANGES_CURSOR_VERSION:
+        raise ValueError('Invalid cursor')
+    # Positions must fit a datetime and a 64-bit id column
+    if any(value < 0 or value >= 2 ** 63 for value in values[1:]):
+        raise ValueError('Invalid cursor')
+    try:
+        _position_moment(values[1])
+        _position_moment(values[3])
+    except (OverflowError, OSError, ValueError):
+        raise ValueError('Invalid cursor')
+    return (values[1], values[2]), (values[3], values[4])
+
+
+def _position_moment(micros):
+    """Aware UTC datetime of a cursor position's epoch microseconds."""
+    from datetime import datetime, timezone as dt_timezone
+
+    return datetime.fromtimestamp(micros // 1_000_000, tz=dt_timezone.utc).replace(microsecond=micros % 1_000_000)
+
+
+def _after_position(queryset, field, position):
+    """Rows of a queryset after a (epoch microseconds, id) position, in change order."""
+    queryset = queryset.order_by(field, 'id')
+    micros, pk = position
+    if not micros and not pk:
+        return queryset
+    moment = _position_moment(micros)
+    # A range on the indexed column, minus the rows already sent at the same moment
+    return queryset.filter(**{f'{field}__gte': moment}).exclude(**{field: moment, 'id__lte': pk})
+
+
+def get_stock_changes(cursor=None, locations=None, limit=500, count_limit=50, now=None):
+    """
+    Stock rows and stock counts changed since a cursor, in bounded pages.
+
+    Stock rows are ordered by (last_updated, id) and counts by
+    (created_at, id); both columns are indexed, so a page is a range scan
+    from the cursor. Rows changed within the last
+    ``STOCK_CHANGES_SETTLE_SECONDS`` are held back until the next call: a
+    transaction that stamped an earlier time but commits late is then
+    still picked up instead of being skipped. Read it from the primary: a
+    replica's lag is not bounded by the settle window.
+
+    Deleted rows are not reported; clients resync from an empty cursor after
+    removing a location or beverage.
+
+    Args:
+        cursor: Cursor from an earlier call (default: start of the feed)
+        locations: Optional QuerySet or list of locations to limit the feed to
+        limit: Maximum number of stock rows per page
+        count_limit: Maximum number of stock counts per page
+        now: Reference moment (default: now)
+
+    Returns:
+        dict: stocks and counts (lists of dicts), the cursor of the next page
+            and has_more (True if the client should call again right away)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from .models import Stock, StockCount, StockCountItem
+
+    stock_position, count_position = decode_changes_cursor(cursor)
+    settled = (now or timezone.now()) - timedelta(seconds=settings.STOCK_CHANGES_SETTLE_SECONDS)
+    stocks = Stock.objects.filter(last_updated__lte=settled)
+    counts = StockCount.objects.filter(created_at__lte=settled)
+    if locations is not None:
+        stocks = stocks.filter(location__in=locations)
+        counts = counts.filter(location__in=locations)
+
+    stock_rows = list(
+        _after_position(stocks, 'last_updated', stock_position)
+        .values_list('id', 'location_id', 'beverage_id', 'quantity', 'updated_by', 'last_updated')[:limit + 1]
+    )
+    count_rows = list(
+        _after_position(counts, 'created_at', count_position)
+        .values_list('id', 'location_id', 'timestamp', 'created_at')[:count_limit + 1]
+    )
+    has_more = len(stock_rows) > limit or len(count_rows) > count_limit
+    stock_rows, count_rows = stock_rows[:limit], count_rows[:count_limit]
+    if stock_rows:
+        stock_position = _changes_position(stock_rows[-1][5], stock_rows[-1][0])
+    if count_rows:
+        count_position = _changes_position(count_rows[-1][3], count_rows[-1][0])
+
+    items = {count_id: [] for count_id, *_ in count_rows}
+    if items:
+        for count_id, beverage_id, quantity, liters in (
+                StockCountItem.objects.filter(stock_count_id__in=items).order_by('id')
+                .values_list('stock_count_id', 'beverage_id', 'quantity', 'liters')):
+            items[count_id].append({
+                'beverage_id': beverage_id,
+                'quantity': compact_number(quantity),
+                'liters': compact_number(liters),
+            })
+
+    catalog = get_catalog()
+    return {
+        'stocks': [
+            {
+                'id': stock_id,
+                'location_id': location_id,
+                'beverage_id': beverage_id,
+                'quantity': compact_number(quantity),
+                'liters': round(float(quantity) * (catalog.liters_factor(beverage_id) or 0), 3),
+                'updated_by': updated_by,
+                'last_updated': last_updated.isoformat(),
+            }
+            for stock_id, location_id, beverage_id, quantity, updated_by, last_updated in stock_rows
+        ],
+        'counts': [
+            {
+                'id': count_id,
+                'location_id': location_id,
+                'timestamp': moment.isoformat(),
+                'created_at': created_at.isoformat(),
+                'items': items[count_id],
+            }
+            for count_id, location_id, moment, created_at in count_rows
+        ],
+        'cursor': encode_changes_cursor(stock_position, count_position),
+        'has_more': has_more,
+    }
+
+
+def _delta_encode(epochs):
+    """Delta encode ascending epoch seconds: the first is absolute, the rest are differences."""
+    return epochs[:1] + [current - previous for previous, current in zip(epochs, epochs[1:])]
+
+
+def downsample_series(epochs, series, max_points):
+    """
+    Reduce series that share one time axis to a point budget.
+
+    Min/max bucketing: the counts between the first and the last one are cut
+    into buckets of equal size, and every bucket becomes two points at its
+    first and last timestamp carrying each series' minimum and maximum in the
+    order they occurred, so peaks and dips survive. The first and last counts
+    are kept as they are. Bucket bounds are computed once for the axis and
+    shared by all series; each series is then scanned in plain Python, so
+    the cost grows with beverages times counts.
+
+    Args:
+        epochs: Ascending epoch seconds of the time axis
+        series: Lists of values aligned with epochs (may be empty)
+        max_points: Maximum number of points per series (at least 4)
+
+    Returns:
+        tuple: Downsampled (epochs, series), unchanged if within the budget
+    """
+    if len(epochs) <= max_points or max_points < 4:
+        return epochs, series
+
+    buckets = (max_points - 2) // 2
+    inner = len(epochs) - 2
+    # Every bucket holds at least two counts because inner > 2 * buckets
+    bounds = [(1 + inner * bucket // buckets) for bucket in range(buckets + 1)]
+    spans = list(zip(bounds, bounds[1:]))
+
+    sampled_epochs = [epochs[0]]
+    for start, stop in spans:
+        sampled_epochs += [epochs[start], epochs[stop - 1]]
+    sampled_epochs.append(epochs[-1])
+
+    sampled_series = []
+    for values in series:
+        sampled = [values[0]]
+        for start, stop in spans:
+            low = high = start
+            for index in range(start + 1, stop):
+                if values[index] < values[low]:
+                    low = index
+                elif values[index] > values[high]:
+                    high = index
+            sampled += [values[low], values[high]] if low <= high else [values[high], values[low]]
+        sampled.append(values[-1])
+        sampled_series.append(sampled)
+    return sampled_epochs, sampled_series
+
+
+def prepare_chart_data_for_location(location, recent_counts, beverage_ids=None, include_series=True,
+                                    max_points=None):
+    """
+    Prepare a compact, columnar chart payload for beverages at a location.
+
+    All beverages share one time axis. Timestamps are epoch seconds, delta
+    encoded: the first entry is absolute and each following entry is the
+    number of seconds since the previous point. ``series`` holds one quantity
+    array per entry of ``beverages``, aligned with the time axis. Long
+    histories are reduced to ``max_points`` points per series with
+    ``downsample_series``; ``count_total`` tells how many counts there were.
 
     Args:
         location: Location object
         recent_counts: QuerySet of StockCount objects
+        beverage_ids: Optional iterable of beverage IDs to limit the payload to
+        include_series: Set to False to return only the time axis and beverage metadata
+        max_points: Point budget per series (default: settings.STOCK_CHART_MAX_POINTS)
 
     Returns:
-        dict: Chart data organized by beverage ID
+        dict: Payload with timestamps, beverages and series, or None without counts
     """
-    if not recent_counts:
+    from .models import StockCountItem
+
+    # Chronological order (oldest to newest)
+    counts = sorted(recent_counts, key=lambda count: count.timestamp)
+    if not counts:
         return None
 
-    all_beverages = Beverage.objects.filter(
-        is_active=True,
-        available_locations=location
-    ).order_by(Lower('name'))
-
-    chart_data = {}
-    for beverage in all_beverages:
-        beverage_data = {
-            'labels': [],
-            'data': [],
-            'alarm_minimum': beverage.alarm_minimum,
-            'color': beverage.color,
-            'liters_per_unit': float(beverage.liters_per_unit)
-        }
-        # Reverse to get chronological order (oldest to newest)
-        for count in reversed(list(recent_counts)):
-            count_items = {item.beverage.id: float(item.quantity) for item in count.items.all()}
-            # Use ISO format with timezone to avoid timezone issues in JavaScript
-            beverage_data['labels'].append(count.timestamp.isoformat())
-            beverage_data['data'].append(count_items.get(beverage.id, 0))
+    all_beverages = get_catalog().beverages_for_location(location.id)
+    if beverage_ids is not None:
+        wanted = set(beverage_ids)
+        all_beverages = [beverage for beverage in all_beverages if beverage.id in wanted]
+
+    if max_points is None:
+        max_points = settings.STOCK_CHART_MAX_POINTS
+
+    epochs = [int(count.timestamp.timestamp()) for count in counts]
+    payload = {
+        'timestamps': _delta_encode(downsample_series(epochs, [], max_points)[0]),
+        'count_total': len(counts),
+        'beverages': [
+            {
+                'id': beverage.id,
+                'name': title(beverage.name),
+                'unit_type': beverage.unit_type,
+                'alarm_minimum': beverage.alarm_minimum,
+                'color': beverage.color,
+                'liters_per_unit': float(beverage.liters_per_unit),
+            }
+            for beverage in all_beverages
+        ],
+    }
+    if not include_series:
+        return payload
+
+    column = {count.id: index for index, count in enumerate(counts)}
+    series = {beverage.id: [0] * len(counts) for beverage in all_beverages}
+
+    # Select the items by time span rather than a (possibly very long) list of count ids
+    items = StockCountItem.objects.filter(
+        stock_count__location=location,
+        stock_count__timestamp__gte=counts[0].timestamp,
+        stock_count__timestamp__lte=counts[-1].timestamp
+    ).order_by()
+    if beverage_ids is not None:
+        items = items.filter(beverage_id__in=series)
+    for count_id, beverage_id, quantity in items.values_list('stock_count_id', 'beverage_id', 'quantity'):
+        row = series.get(beverage_id)
+        index = column.get(count_id)
+        if row is not None and index is not None:
+            row[index] = compact_number(quantity)
+
+    sampled_epochs, payload['series'] = downsample_series(
+        epochs, [series[beverage.id] for beverage in all_beverages], max_points
+    )
+    payload['timestamps'] = _delta_encode(sampled_epochs)
+    return payload
+
+
+def prepare_total_liters_for_location(location, recent_counts, max_points=None):
+    """
+    Prepare the total liters of a location's counts as one chart series.
+
+    The totals are summed in the database from the liters stored on the count
+    items, so the cost depends on the number of counts and not on how many
+    beverages the location has. Timestamps are delta encoded and downsampled
+    like in ``prepare_chart_data_for_location``.
+
+    Args:
+        location: Location object
+        recent_counts: QuerySet of StockCount objects
+        max_points: Point budget for the series (default: settings.STOCK_CHART_MAX_POINTS)
+
+    Returns:
+        dict: Payload with timestamps, count_total and total_liters, or None without counts
+    """
+    from django.db.models import Sum
+    from .models import StockCountItem
+
+    counts = sorted(recent_counts, key=lambda count: count.timestamp)
+    if not counts:
+        return None
 
-        chart_data[beverage.id] = beverage_data
+    if max_points is None:
+        max_points = settings.STOCK_CHART_MAX_POINTS
 
-    return chart_data
+    totals = dict(
+        StockCountItem.objects.filter(
+            stock_count__location=location,
+            stock_count__timestamp__gte=counts[0].timestamp,
+            stock_count__timestamp__lte=counts[-1].timestamp
+        ).order_by().values('stock_count_id').annotate(total=Sum('liters')).values_list('stock_count_id', 'total')
+    )
+    epochs = [int(count.timestamp.timestamp()) for count in counts]
+    liters = [compact_number(totals.get(count.id, Decimal('0')).quantize(Decimal('0.01'))) for count in counts]
+    sampled_epochs, (sampled_liters,) = downsample_series(epochs, [liters], max_points)
+    return {
+        'timestamps': _delta_encode(sampled_epochs),
+        'count_total': len(counts),
+        'total_liters': sampled_liters,
+    }
 
 
-def get_or_create_stock_for_location(location):
+def ensure_stock_for_location(location):
     """
-    Get or create stock entries for all beverages at a location.
+    Create missing zero-quantity stock entries for all beverages at a location.
 
     Args:
         location: Location object
 
     Returns:
-        list: List of dicts with beverage, stock, and liters info (sorted alphabetically by beverage name)
+        int: Number of stock entries created
     """
     from .models import Stock
 
-    beverages = location.beverages.filter(is_active=True).order_by(Lower('name'))
-    stock_data = []
+    beverage_ids = {beverage.id for beverage in get_catalog().beverages_for_location(location.id)}
+    existing = set(Stock.objects.filter(location=location).order_by().values_list('beverage_id', flat=True))
+    missing = [
+        Stock(beverage_id=beverage_id, location=location, quantity=0)
+        for beverage_id in beverage_ids - existing
+    ]
+    Stock.objects.bulk_create(missing, ignore_conflicts=True)
+    if missing:
+        refresh_low_stock(location_ids=[location.pk], beverage_ids=[stock.beverage_id for stock in missing])
+    return len(missing)
 
-    for beverage in beverages:
-        stock, created = Stock.objects.get_or_create(
-            beverage=beverage,
-            location=location,
-            defaults={'quantity': 0}
+
+def filter_location_beverages(location, query='', unit_type_id=None, low_only=False):
+    """
+    Filter the active beverages at a location.
+
+    Args:
+        location: Location object
+        query: Name prefix, matched case-insensitively against the start of any word
+        unit_type_id: Optional unit type ID to restrict to
+        low_only: Only include beverages whose stock is below their alarm minimum
+
+    Returns:
+        list: Matching catalog beverages, sorted alphabetically by name
+    """
+    from .models import Stock
+
+    beverages = get_catalog().search_location_beverages(location.id, query)
+    if unit_type_id is not None:
+        beverages = [beverage for beverage in beverages if beverage.unit_type_id == unit_type_id]
+
+    if low_only:
+        low_ids = set(
+            Stock.objects.filter(location=location, is_low=True).order_by().values_list('beverage_id', flat=True)
+        )
+        beverages = [b for b in beverages if b.id in low_ids]
+
+    return list(beverages)
+
+
+def get_or_create_stock_for_location(location, beverages=None):
+    """
+    Get or create stock entries for beverages at a location.
+
+    Args:
+        location: Location object
+        beverages: Catalog beverages to include (default: all active beverages at the location)
+
+    Returns:
+        list: List of dicts with beverage, stock, and liters info (in the order of beverages)
+    """
+    from .models import Stock
+
+    if beverages is None:
+        beverages = get_catalog().beverages_for_location(location.id)
+    beverage_ids = [beverage.id for beverage in beverages]
+
+    stocks = {
+        stock.beverage_id: stock
+        for stock in Stock.objects.filter(location=location, beverage_id__in=beverage_ids).order_by()
+    }
+    missing = [beverage_id for beverage_id in beverage_ids if beverage_id not in stocks]
+    if missing:
+        Stock.objects.bulk_create(
+            [Stock(beverage_id=beverage_id, location=location, quantity=0) for beverage_id in missing],
+            ignore_conflicts=True
         )
-        stock_data.append({
+        refresh_low_stock(location_ids=[location.pk], beverage_ids=missing)
+        stocks.update(
+            (stock.beverage_id, stock)
+            for stock in Stock.objects.filter(location=location, beverage_id__in=missing).order_by()
+        )
+
+    return [
+        {
             'beverage': beverage,
-            'stock': stock,
-            'liters': stock.liters
-        })
+            'stock': stocks[beverage.id],
+            'liters': stocks[beverage.id].liters
+        }
+        for beverage in beverages
+    ]
 
-    return stock_data
 
+def _assignment_ids(objects):
+    """IDs of model instances, a QuerySet or plain IDs, without duplicates and in order."""
+    if isinstance(objects, QuerySet):
+        objects = objects.order_by().values_list('pk', flat=True)
+    return list(dict.fromkeys(getattr(obj, 'pk', obj) for obj in objects))
 
-def update_stock_quantity(stock, quantity, updated_by='User'):
+
+@retry_on_database_locked
+def assign_beverages(beverages, locations):
     """
-    Update stock quantity.
+    Make many beverages available at many locations at once.
+
+    The through table rows are inserted with one set-based insert that skips
+    existing pairs, and the matching zero-quantity stock rows are created in
+    the same transaction. Unlike ``available_locations.add()`` no
+    ``m2m_changed`` signal is sent, so the catalog version is bumped once
+    after the commit and the low-stock flags are refreshed here.
+
+    Args:
+        beverages: Beverage objects, a QuerySet or beverage IDs
+        locations: Location objects, a QuerySet or location IDs
+
+    Returns:
+        dict: Numbers of new assignments and of created stock rows
+    """
+    from inventory.catalog import bump_catalog_version
+    from .models import Stock
+
+    beverage_ids = _assignment_ids(beverages)
+    location_ids = _assignment_ids(locations)
+    if not beverage_ids or not location_ids:
+        return {'assigned': 0, 'stocks': 0}
+    through = Beverage.available_locations.through
+
+    with immediate_atomic():
+        assigned = set(
+            through.objects.filter(beverage_id__in=beverage_ids, location_id__in=location_ids)
+            .values_list('beverage_id', 'location_id')
+        )
+        stocked = set(
+            Stock.objects.filter(beverage_id__in=beverage_ids, location_id__in=location_ids)
+            .order_by().values_list('beverage_id', 'location_id')
+        )
+        pairs = [(beverage_id, location_id) for beverage_id in beverage_ids for location_id in location_ids]
+        new_pairs = [pair for pair in pairs if pair not in assigned]
+        missing_stock = [pair for pair in pairs if pair not in stocked]
+
+        through.objects.bulk_create(
+            [through(beverage_id=beverage_id, location_id=location_id) for beverage_id, location_id in new_pairs],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        Stock.objects.bulk_create(
+            [Stock(beverage_id=beverage_id, location_id=location_id, quantity=0)
+             for beverage_id, location_id in missing_stock],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        if new_pairs or missing_stock:
+            refresh_low_stock(location_ids=location_ids, beverage_ids=beverage_ids)
+            # Rebuilding before the commit would cache the old assignments under the new version
+            transaction.on_commit(bump_catalog_version)
+
+    return {'assigned': len(new_pairs), 'stocks': len(missing_stock)}
+
+
+@retry_on_database_locked
+def unassign_beverages(beverages, locations):
+    """
+    Remove many beverages from many locations at once.
+
+    The through table rows go in one set-based delete. Stock rows are kept
+    (with their history); they no longer count as low stock.
+
+    Args:
+        beverages: Beverage objects, a QuerySet or beverage IDs
+        locations: Location objects, a QuerySet or location IDs
+
+    Returns:
+        int: Number of removed assignments
+    """
+    from inventory.catalog import bump_catalog_version
+
+    beverage_ids = _assignment_ids(beverages)
+    location_ids = _assignment_ids(locations)
+    if not beverage_ids or not location_ids:
+        return 0
+    through = Beverage.available_locations.through
+
+    with immediate_atomic():
+        removed, _ = through.objects.filter(beverage_id__in=beverage_ids, location_id__in=location_ids).delete()
+        if removed:
+            refresh_low_stock(location_ids=location_ids, beverage_ids=beverage_ids)
+            transaction.on_commit(bump_catalog_version)
+
+    return removed
+
+
+def refresh_low_stock(location_ids=None, beverage_ids=None):
+    """
+    Recompute low-stock flags and location alert counters from the database.
+
+    Stock writes keep the flags up to date incrementally; this set-based
+    version is used when the rule itself changes (a beverage's alarm minimum,
+    active state or locations), for new stock rows and for repairs.
+
+    Args:
+        location_ids: Optional location IDs to limit the refresh to
+        beverage_ids: Optional beverage IDs to limit the refresh to
+
+    Returns:
+        int: Number of stock rows whose flag changed
+    """
+    from django.db.models import Exists
+    from .models import Stock
+
+    stocks = Stock.objects.order_by()
+    if location_ids is not None:
+        stocks = stocks.filter(location_id__in=location_ids)
+    if beverage_ids is not None:
+        stocks = stocks.filter(beverage_id__in=beverage_ids)
+
+    below_minimum = Exists(Beverage.objects.filter(
+        pk=OuterRef('beverage_id'),
+        is_active=True,
+        alarm_minimum__gt=OuterRef('quantity'),
+        available_locations=OuterRef('location_id')
+    ))
+    changed = stocks.filter(below_minimum, is_low=False).update(is_low=True)
+    changed += stocks.filter(~below_minimum, is_low=True).update(is_low=False)
+    if changed:
+        recount_low_stock(location_ids)
+    return changed
+
+
+def recount_low_stock(location_ids=None):
+    """
+    Recount the low-stock alert counter of locations from their flagged stock rows.
+
+    Args:
+        location_ids: Optional location IDs to recount (default: all locations)
+    """
+    from django.db.models import Count
+    from django.db.models.functions import Coalesce
+    from .models import Stock
+
+    low_count = (
+        Stock.objects.filter(location=OuterRef('pk'), is_low=True).order_by()
+        .values('location').annotate(low=Count('id')).values('low')
+    )
+    locations = Location.objects.all()
+    if location_ids is not None:
+        locations = locations.filter(id__in=location_ids)
+    locations.update(low_stock_count=Coalesce(Subquery(low_count), 0))
+
+
+def _sync_low_stock_flags(rows):
+    """
+    Flip the low-stock flag of changed stock rows and adjust the location counters.
+
+    Must run inside the transaction that changed the quantities.
+
+    Args:
+        rows: Iterable of (stock_id, location_id, beverage_id, quantity, is_low) tuples,
+            with the new quantity and the flag as stored before the change
+
+    Returns:
+        set: IDs of the stock rows whose flag changed
+    """
+    from django.db.models import F
+    from django.db.models.functions import Greatest
+    from .models import Stock
+
+    catalog = get_catalog(fresh=True)
+    flipped = {True: [], False: []}
+    deltas = {}
+    for stock_id, location_id, beverage_id, quantity, was_low in rows:
+        is_low = catalog.is_low(location_id, beverage_id, quantity)
+        if is_low != was_low:
+            flipped[is_low].append(stock_id)
+            deltas[location_id] = deltas.get(location_id, 0) + (1 if is_low else -1)
+
+    for is_low, stock_ids in flipped.items():
+        if stock_ids:
+            Stock.objects.filter(id__in=stock_ids).update(is_low=is_low)
+    for location_id, delta in deltas.items():
+        if delta:
+            Location.objects.filter(pk=location_id).update(
+                low_stock_count=Greatest(F('low_stock_count') + delta, 0)
+            )
+    return set(flipped[True]) | set(flipped[False])
+
+
+@retry_on_database_locked
+def _write_stock_quantity(stock, kind, new_quantity, updated_by, user):
+    """Save a new stock quantity and append its movement in one transaction (retried if SQLite is locked)."""
+    from .models import Stock, StockMovement
+
+    with immediate_atomic():
+        # Lock the row so concurrent taps apply on top of each other
+        current, was_low = (
+            Stock.objects.select_for_update().order_by().values_list('quantity', 'is_low').get(pk=stock.pk)
+        )
+        quantity = new_quantity(current)
+        stock.quantity = quantity
+        stock.updated_by = updated_by
+        stock.save(update_fields=['quantity', 'updated_by', 'last_updated'])
+        flipped = _sync_low_stock_flags([(stock.pk, stock.location_id, stock.beverage_id, quantity, was_low)])
+        stock.is_low = not was_low if flipped else was_low
+        StockMovement.objects.create(
+            stock=stock,
+            kind=kind,
+            delta=quantity - current,
+            quantity=quantity,
+            user=user if user is not None and user.is_authenticated else None,
+            updated_by=updated_by,
+            timestamp=stock.last_updated
+        )
+    return stock
+
+
+def update_stock_quantity(stock, quantity, updated_by='User', user=None):
+    """
+    Update stock quantity and record the movement.
 
     Args:
         stock: Stock object
         quantity: New quantity value
         updated_by: User who made the update
+        user: Optional authenticated user, stored on the movement
 
     Returns:
         Stock: Updated stock object
     """
-    stock.quantity = Decimal(str(quantity))
-    stock.updated_by = updated_by
-    stock.save()
+    from .models import StockMovement
+
+    quantity_decimal = Decimal(str(quantity))
+    return _write_stock_quantity(stock, StockMovement.KIND_SET, lambda current: quantity_decimal, updated_by, user)
+
+
+def save_stock(stock, updated_by='User', user=None):
+    """
+    Save a Stock object edited as a whole, e.g. in the admin or by an import.
+
+    Every field but the quantity is saved as it is. A changed quantity is then
+    written with ``update_stock_quantity``, so it is recorded in the movement
+    ledger like a tap and point-in-time queries see it.
+
+    Args:
+        stock: Stock object with its new values
+        updated_by: User who made the update
+        user: Optional authenticated user, stored on the movement
+
+    Returns:
+        Stock: Saved stock object
+    """
+    from .models import Stock
+
+    quantity = Decimal(str(stock.quantity))
+    if stock._state.adding:
+        stock.quantity = Decimal('0')
+        stock.save()
+    else:
+        stock.quantity = Stock.objects.values_list('quantity', flat=True).get(pk=stock.pk)
+        stock.save(update_fields=[
+            field.name for field in Stock._meta.concrete_fields
+            if not field.primary_key and field.name not in ('quantity', 'is_low')
+        ])
+    if quantity != stock.quantity:
+        update_stock_quantity(stock, quantity, updated_by=updated_by, user=user)
     return stock
 
 
-def adjust_stock_quantity(stock, adjustment, updated_by='User'):
+def adjust_stock_quantity(stock, adjustment, updated_by='User', user=None):
     """
-    Adjust stock quantity by a relative amount.
+    Adjust stock quantity by a relative amount and record the movement.
 
     Args:
         stock: Stock object
         adjustment: Amount to adjust (positive or negative)
         updated_by: User who made the adjustment
+        user: Optional authenticated user, stored on the movement
 
     Returns:
         Stock: Updated stock object
     """
+    from .models import StockMovement
+
     adjustment_decimal = Decimal(str(adjustment))
-    stock.quantity = max(Decimal('0'), stock.quantity + adjustment_decimal)
-    stock.updated_by = updated_by
-    stock.save()
-    return stock
+    return _write_stock_quantity(
+        stock,
+        StockMovement.KIND_ADJUST,
+        lambda current: max(Decimal('0'), current + adjustment_decimal),
+        updated_by,
+        user
+    )
+
+
+@retry_on_database_locked
+def apply_idempotent(key, user, operation):
+    """
+    Run an operation at most once per idempotency key.
+
+    The key is stored in the same transaction as the operation, so a replay
+    (a retried request or a re-sent offline tap) either finds the key and
+    gets the stored result back, or the first attempt failed and rolled the
+    key back with it.
+
+    Args:
+        key: Client-chosen key of at most 64 characters; empty runs the operation without deduplication
+        user: User making the request (replays by another user are rejected)
+        operation: Callable performing the writes and returning a JSON-serializable result
+
+    Returns:
+        tuple: (result, replayed) where replayed is True if the key had been used before
+
+    Raises:
+        ValueError: If the key is too long or was used by another user
+    """
+    from datetime import timedelta
+    from django.db import IntegrityError
+    from django.utils import timezone
+    from .models import IdempotencyKey
+
+    if not key:
+        return operation(), False
+    if len(key) > 64:
+        raise ValueError('Idempotency key is too long')
+    user_id = user.pk if user is not None and user.is_authenticated else None
+
+    def replay():
+        existing = IdempotencyKey.objects.filter(key=key).values_list('user_id', 'result').first()
+        if existing is not None and existing[0] != user_id:
+            raise ValueError('Idempotency key was used by another user')
+        return existing
+
+    existing = replay()
+    if existing is not None:
+        return existing[1], True
+    try:
+        with immediate_atomic():
+            now = timezone.now()
+            record = IdempotencyKey.objects.create(
+                key=key,
+                user_id=user_id,
+                created_at=now,
+                expires_at=now + timedelta(days=settings.IDEMPOTENCY_KEY_DAYS)
+            )
+            result = operation()
+            IdempotencyKey.objects.filter(pk=record.pk).update(result=result)
+    except IntegrityError:
+        # A concurrent request with the same key committed first
+        existing = replay()
+        if existing is None:
+            raise
+        return existing[1], True
+    return result, False
+
+
+def purge_expired_idempotency_keys(now=None):
+    """
+    Delete idempotency keys past their expiry.
+
+    Args:
+        now: Reference moment (default: now)
+
+    Returns:
+        int: Number of keys deleted
+    """
+    from django.utils import timezone
+    from .models import IdempotencyKey
+
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=now or timezone.now()).delete()
+    return deleted
 
 
-def create_stock_count(location, stocks):
+def parse_transfer_lines(lines):
+    """
+    Validate transfer lines and merge lines for the same beverage.
+
+    Args:
+        lines: Iterable of (beverage_id, quantity) pairs
+
+    Returns:
+        dict: Mapping of beverage ID to a positive Decimal quantity
+    """
+    merged = {}
+    for beverage_id, quantity in lines:
+        quantity = Decimal(str(quantity))
+        if quantity < 0:
+            raise ValueError('Transfer quantities must be positive')
+        if quantity:
+            merged[int(beverage_id)] = merged.get(int(beverage_id), Decimal('0')) + quantity
+    return merged
+
+
+class _ShortStock(Exception):
+    """Raised inside a transfer transaction to roll it back when the source is short."""
+
+
+@retry_on_database_locked
+def transfer_stock(source, destination, lines, updated_by='User', user=None, note=''):
+    """
+    Move stock of many beverages from one location to another in one transaction.
+
+    The source and the destination are each changed with a single
+    conditional UPDATE. The source UPDATE only matches rows that hold
+    enough stock, so if any line is short nothing is changed at all.
+    Destination stock rows are created when missing. Every line is
+    recorded as a pair of movements belonging to the transfer.
+
+    Args:
+        source: Location the stock leaves
+        destination: Location the stock arrives at
+        lines: Iterable of (beverage_id, quantity) pairs
+        updated_by: Name of the person making the transfer
+        user: Optional authenticated user, stored on the transfer and movements
+        note: Optional note, e.g. a delivery reference
+
+    Returns:
+        StockTransfer: The recorded transfer
+
+    Raises:
+        ValueError: If the transfer is empty, the locations are the same, a
+            beverage isn't available at the destination or the source doesn't
+            hold enough stock
+    """
+    from .models import Stock
+
+    if source.pk == destination.pk:
+        raise ValueError('Source and destination must be different locations')
+    quantities = parse_transfer_lines(lines)
+    if not quantities:
+        raise ValueError('Nothing to transfer')
+    beverage_ids = list(quantities)
+    user = user if user is not None and user.is_authenticated else None
+
+    catalog = get_catalog(fresh=True)
+    offered = {beverage.id for beverage in catalog.beverages_for_location(destination.pk)}
+    unavailable = [beverage_id for beverage_id in beverage_ids if beverage_id not in offered]
+    if unavailable:
+        names = ', '.join(
+            catalog.beverage(beverage_id).name if catalog.beverage(beverage_id) else str(beverage_id)
+            for beverage_id in unavailable
+        )
+        raise ValueError(f"Not available at {destination.name}: {names}")
+
+    try:
+        with immediate_atomic():
+            transfer = _apply_transfer(source, destination, quantities, updated_by, user, note)
+    except _ShortStock:
+        # The failed UPDATE was rolled back: report the quantities as they are
+        available = dict(
+            Stock.objects.filter(location=source, beverage_id__in=beverage_ids)
+            .order_by().values_list('beverage_id', 'quantity')
+        )
+        short = [
+            f"{catalog.beverage(beverage_id).name if catalog.beverage(beverage_id) else beverage_id} "
+            f"({compact_number(available.get(beverage_id, Decimal('0')))} of {compact_number(quantity)})"
+            for beverage_id, quantity in quantities.items()
+            if available.get(beverage_id, Decimal('0')) < quantity
+        ]
+        raise ValueError(f"Not enough stock at {source.name}: {', '.join(short)}")
+
+    return transfer
+
+
+def _apply_transfer(source, destination, quantities, updated_by, user, note):
+    """Write a validated transfer; must run inside a transaction."""
+    from django.db.models import Case, DecimalField, F, Q, When
+    from django.utils import timezone
+    from .models import Stock, StockMovement, StockTransfer
+
+    def shifted(sign):
+        return Case(
+            *[When(beverage_id=beverage_id, then=F('quantity') + sign * quantity)
+              for beverage_id, quantity in quantities.items()],
+            default=F('quantity'),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+
+    beverage_ids = list(quantities)
+    now = timezone.now()
+    Stock.objects.bulk_create(
+        [Stock(beverage_id=beverage_id, location=destination, quantity=0) for beverage_id in beverage_ids],
+        ignore_conflicts=True
+    )
+
+    enough = Q()
+    for beverage_id, quantity in quantities.items():
+        enough |= Q(beverage_id=beverage_id, quantity__gte=quantity)
+    taken = Stock.objects.filter(enough, location=source).update(
+        quantity=shifted(-1), updated_by=updated_by, last_updated=now
+    )
+    if taken != len(quantities):
+        raise _ShortStock()
+
+    Stock.objects.filter(location=destination, beverage_id__in=beverage_ids).update(
+        quantity=shifted(1), updated_by=updated_by, last_updated=now
+    )
+
+    transfer = StockTransfer.objects.create(
+        source=source,
+        destination=destination,
+        user=user,
+        updated_by=updated_by,
+        note=note,
+        timestamp=now
+    )
+    rows = list(
+        Stock.objects.filter(location__in=[source, destination], beverage_id__in=beverage_ids)
+        .order_by().values_list('id', 'location_id', 'beverage_id', 'quantity', 'is_low')
+    )
+    _sync_low_stock_flags(rows)
+    movements = []
+    for stock_id, location_id, beverage_id, quantity, _ in rows:
+        delta = quantities[beverage_id] if location_id == destination.pk else -quantities[beverage_id]
+        movements.append(StockMovement(
+            stock_id=stock_id,
+            kind=StockMovement.KIND_TRANSFER,
+            delta=delta,
+            quantity=quantity,
+            user=user,
+            updated_by=updated_by,
+            transfer=transfer,
+            timestamp=now
+        ))
+    StockMovement.objects.bulk_create(movements)
+
+    return transfer
+
+
+def get_stock_as_of(when, locations=None):
+    """
+    Reconstruct the stock of locations at a moment in time.
+
+    For every location the last stock count at or before ``when`` is the
+    checkpoint. Stocks with a movement recorded after that checkpoint use the
+    quantity of their last movement at or before ``when``; the others keep
+    the counted quantity. This takes three queries whatever the number of
+    locations: one indexed seek per location for the checkpoint, one for the
+    checkpoint items and one indexed seek per stock for its last movement.
+
+    Args:
+        when: Aware datetime
+        locations: Optional QuerySet or list of locations (default: all active locations)
+
+    Returns:
+        list: One dict per location with its checkpoint, items and total liters
+    """
+    from .models import Stock, StockCount, StockCountItem, StockMovement
+
+    if locations is None:
+        locations = Location.objects.filter(is_active=True)
+    elif not isinstance(locations, QuerySet):
+        locations = Location.objects.filter(pk__in=[location.pk for location in locations])
+
+    counts = StockCount.objects.filter(location=OuterRef('pk'), timestamp__lte=when).order_by('-timestamp')
+    checkpoints = {
+        location.pk: location
+        for location in locations.annotate(
+            checkpoint_id=Subquery(counts.values('pk')[:1]),
+            checkpoint_time=Subquery(counts.values('timestamp')[:1]),
+        )
+    }
+    location_ids = list(checkpoints)
+
+    counted = {}
+    count_location = {
+        location.checkpoint_id: location.pk
+        for location in checkpoints.values() if location.checkpoint_id is not None
+    }
+    items = StockCountItem.objects.filter(stock_count_id__in=count_location).order_by().values_list(
+        'stock_count_id', 'beverage_id', 'quantity', 'liters'
+    )
+    for count_id, beverage_id, quantity, liters in items:
+        counted[(count_location[count_id], beverage_id)] = (quantity, float(liters))
+
+    movements = StockMovement.objects.filter(stock=OuterRef('pk'), timestamp__lte=when).order_by('-timestamp', '-id')
+    moved = {}
+    stocks = Stock.objects.filter(location_id__in=location_ids).order_by().annotate(
+        moved_quantity=Subquery(movements.values('quantity')[:1]),
+        moved_time=Subquery(movements.values('timestamp')[:1]),
+    ).values_list('location_id', 'beverage_id', 'moved_quantity', 'moved_time')
+    for location_id, beverage_id, quantity, moved_time in stocks:
+        checkpoint_time = checkpoints[location_id].checkpoint_time
+        if moved_time is not None and (checkpoint_time is None or moved_time > checkpoint_time):
+            moved[(location_id, beverage_id)] = quantity
+
+    catalog = get_catalog()
+    results = []
+    for location_id in location_ids:
+        location = checkpoints[location_id]
+        items = []
+        for beverage in catalog.beverages.values():
+            key = (location_id, beverage.id)
+            if key in moved:
+                quantity = moved[key]
+                liters = float(quantity) * beverage.liters_factor
+                source = 'movement'
+            elif key in counted:
+                quantity, liters = counted[key]
+                source = 'count'
+            else:
+                continue
+            items.append({
+                'beverage': beverage,
+                'quantity': quantity,
+                'liters': liters,
+                'source': source,
+            })
+        results.append({
+            'location': location,
+            'checkpoint_id': location.checkpoint_id,
+            'checkpoint_time': location.checkpoint_time,
+            'items': items,
+            'total_liters': sum(item['liters'] for item in items),
+        })
+
+    return results
+
+
+def serialize_stock_as_of(results):
+    """
+    Convert the result of get_stock_as_of into JSON-serializable data.
+
+    Args:
+        results: List returned by get_stock_as_of
+
+    Returns:
+        list: One dict per location with its items
+    """
+    return [
+        {
+            'location_id': result['location'].pk,
+            'location': result['location'].name,
+            'checkpoint_id': result['checkpoint_id'],
+            'checkpoint_time': result['checkpoint_time'].isoformat() if result['checkpoint_time'] else None,
+            'total_liters': round(result['total_liters'], 2),
+            'items': [
+                {
+                    'beverage_id': item['beverage'].id,
+                    'beverage': item['beverage'].name,
+                    'quantity': compact_number(item['quantity']),
+                    'liters': round(item['liters'], 2),
+                    'source': item['source'],
+                }
+                for item in result['items']
+            ],
+        }
+        for result in results
+    ]
+
+
+def parse_moment(value):
+    """
+    Parse an ISO date or datetime into an aware datetime.
+
+    Naive values are interpreted in the current time zone; a bare date means
+    the start of that day.
+
+    Args:
+        value: String such as "2026-10-18T02:00" or "2026-10-18"
+
+    Returns:
+        datetime: Aware datetime, or None if the value cannot be parsed
+    """
+    from datetime import datetime, time as dt_time
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date, parse_datetime
+
+    value = (value or '').strip()
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day, dt_time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def reconstruct_location_stock(location, when):
+    """
+    Reconstruct the stock quantities of a location at a moment in time.
+
+    Args:
+        location: Location object
+        when: Aware datetime
+
+    Returns:
+        dict: Quantity per beverage ID
+    """
+    (result,) = get_stock_as_of(when, [location])
+    return {item['beverage'].id: item['quantity'] for item in result['items']}
+
+
+_revision_ids = {}
+_revision_ids_version = None
+
+
+def get_beverage_revision_ids(beverages):
+    """
+    Return the current revision id of each beverage, creating missing revisions.
+
+    Revisions are immutable, so resolved ids are kept in a process-local
+    cache for as long as the reference data catalog version doesn't change.
+
+    Args:
+        beverages: Iterable of BeverageInfo objects from the catalog; None
+            entries (beverages deleted meanwhile) are skipped
+
+    Returns:
+        dict: Mapping of beverage ID to BeverageRevision ID
+    """
+    from django.db.models import Q
+    from .models import BeverageRevision
+    global _revision_ids, _revision_ids_version
+
+    version = get_catalog().version
+    if _revision_ids_version != version:
+        _revision_ids, _revision_ids_version = {}, version
+    cache = _revision_ids
+
+    keys = {(b.id, b.unit_type[:50], b.liters_per_unit) for b in beverages if b is not None}
+    missing = [key for key in keys if key not in cache]
+    if missing:
+        BeverageRevision.objects.bulk_create([
+            BeverageRevision(beverage_id=beverage_id, unit_type_name=unit_type_name, liters_per_unit=liters_per_unit)
+            for beverage_id, unit_type_name, liters_per_unit in missing
+        ], ignore_conflicts=True)
+
+        condition = Q()
+        for beverage_id, unit_type_name, liters_per_unit in missing:
+            condition |= Q(beverage_id=beverage_id, unit_type_name=unit_type_name, liters_per_unit=liters_per_unit)
+        for revision in BeverageRevision.objects.filter(condition):
+            cache[(revision.beverage_id, revision.unit_type_name, revision.liters_per_unit)] = revision.id
+
+    return {beverage_id: cache[(beverage_id, unit_type_name, liters_per_unit)]
+            for beverage_id, unit_type_name, liters_per_unit in keys}
+
+
+@retry_on_database_locked
+def create_stock_count(location, stocks=None, timestamp=None):
     """
     Create a stock count record with all items.
 
+    Without ``stocks``, the location's stock is read in a single query inside
+    the transaction that writes the count, and the count is stamped with the
+    moment of that read, so it matches one real state of the stock. The
+    read does not lock the stock rows (a consistent read on MySQL; on SQLite
+    the transaction holds the write lock for the few milliseconds it takes),
+    so taps are not blocked for longer than the insert.
+
     Args:
         location: Location object
-        stocks: QuerySet of Stock objects to count
+        stocks: Optional Stock objects that were already read
+        timestamp: When ``stocks`` were read (default: now)
 
     Returns:
         StockCount: Created stock count object
     """
-    from .models import StockCount, StockCountItem
+    from django.utils import timezone
+    from .models import Stock, StockCount, StockCountItem
 
-    stock_count = StockCount.objects.create(
-        location=location
-    )
+    catalog = get_catalog(fresh=True)
+    if stocks is None:
+        # Assignments create stock rows; this covers rows missing from older data
+        ensure_stock_for_location(location)
 
-    for stock in stocks:
-        StockCountItem.objects.create(
-            stock_count=stock_count,
-            beverage=stock.beverage,
-            quantity=stock.quantity,
-            liters=Decimal(str(stock.liters)),
-            unit_type_name=str(stock.beverage.unit_type),
-            liters_per_unit=stock.beverage.liters_per_unit
+    with immediate_atomic():
+        if stocks is None:
+            timestamp = timezone.now()
+            stocks = Stock.objects.filter(location=location, beverage__is_active=True).order_by()
+        beverages = {stock.beverage_id: catalog.beverage(stock.beverage_id) for stock in stocks}
+        # Leave out beverages deleted since the stock was read
+        stocks = [stock for stock in stocks if beverages[stock.beverage_id] is not None]
+        revision_ids = get_beverage_revision_ids(beverages.values())
+
+        stock_count = StockCount.objects.create(
+            location=location,
+            timestamp=timestamp or timezone.now()
         )
 
+        StockCountItem.objects.bulk_create([
+            StockCountItem(
+                stock_count=stock_count,
+                beverage_id=stock.beverage_id,
+                quantity=stock.quantity,
+                liters=Decimal(str(stock.liters)),
+                revision_id=revision_ids[stock.beverage_id]
+            )
+            for stock in stocks
+        ])
+
     return stock_count
+
+
+def snapshot_locations(locations, only_changed=True):
+    """
+    Save a stock count for each of the given locations.
+
+    The stock of all locations is read in one query. With ``only_changed``,
+    a location is skipped when none of its stock changed after its last
+    count (by ``Stock.last_updated``), so repeated runs don't duplicate
+    unchanged history. Locations without stock rows are always skipped.
+
+    Args:
+        locations: Iterable of Location objects
+        only_changed: Skip locations whose stock is unchanged since their last count
+
+    Returns:
+        tuple: (list of created StockCount objects, list of skipped Location objects)
+    """
+    from django.db.models import Max
+    from django.utils import timezone
+    from .models import Stock, StockCount
+
+    locations = list(locations)
+    location_ids = [location.id for location in locations]
+
+    stocks_by_location = {}
+    read_at = timezone.now()
+    stocks = (
+        Stock.objects.filter(location_id__in=location_ids, beverage__is_active=True)
+        .order_by('location_id', 'beverage_id')
+        .only('id', 'location_id', 'beverage_id', 'quantity', 'last_updated')
+    )
+    for stock in stocks:
+        stocks_by_location.setdefault(stock.location_id, []).append(stock)
+
+    last_counted = {}
+    if only_changed:
+        last_counted = dict(
+            StockCount.objects.filter(location_id__in=location_ids)
+            .order_by().values('location_id').annotate(last=Max('timestamp'))
+            .values_list('location_id', 'last')
+        )
+
+    created, skipped = [], []
+    for location in locations:
+        location_stocks = stocks_by_location.get(location.id)
+        last = last_counted.get(location.id)
+        if not location_stocks or (
+                last is not None and max(stock.last_updated for stock in location_stocks) <= last):
+            skipped.append(location)
+            continue
+        created.append(create_stock_count(location, location_stocks, timestamp=read_at))
+
+    return created, skipped
+
+
+def get_auto_count_moment(location, day):
+    """
+    Return when a location's automatic count is scheduled on a day.
+
+    Args:
+        location: Location object
+        day: Local date
+
+    Returns:
+        datetime: Aware datetime, or None if the location has no count time
+    """
+    from datetime import datetime, time
+    from django.utils import timezone
+
+    at = location.auto_count_time
+    if at is None and settings.AUTO_STOCK_COUNT_TIME:
+        at = time.fromisoformat(settings.AUTO_STOCK_COUNT_TIME)
+    if at is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, at))
+
+
+def run_scheduled_counts(now=None):
+    """
+    Take the automatic counts that are due.
+
+    A location is due once its count time has passed today and the scheduler
+    has not handled it since. Unchanged locations are skipped but still
+    marked as handled, so they are not retried until the next day.
+
+    Args:
+        now: Current time (default: timezone.now())
+
+    Returns:
+        tuple: (list of created StockCount objects, list of skipped Location objects)
+    """
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    today = timezone.localtime(now).date()
+
+    due = []
+    for location in Location.objects.filter(is_active=True):
+        moment = get_auto_count_moment(location, today)
+        if moment is not None and moment <= now and (
+                location.last_auto_count_at is None or location.last_auto_count_at < moment):
+            due.append(location)
+
+    if not due:
+        return [], []
+
+    created, skipped = snapshot_locations(due)
+    # Queryset update: does not bump the location access or catalog versions
+    Location.objects.filter(id__in=[location.id for location in due]).update(last_auto_count_at=now)
+    return created, skipped
+
+
+def _diff_row(beverage_id, side_a, side_b, catalog):
+    """Build one count diff row from (quantity, liters) tuples of both sides."""
+    beverage = catalog.beverage(beverage_id)
+    zero = (Decimal('0'), Decimal('0'))
+    quantity_a, liters_a = side_a or (None, None)
+    quantity_b, liters_b = side_b or (None, None)
+    return {
+        'beverage_id': beverage_id,
+        'beverage': beverage.name if beverage else str(beverage_id),
+        'quantity_a': quantity_a,
+        'quantity_b': quantity_b,
+        'delta': (side_b or zero)[0] - (side_a or zero)[0],
+        'liters_a': liters_a,
+        'liters_b': liters_b,
+        'liters_delta': (side_b or zero)[1] - (side_a or zero)[1],
+        'only_in': 'a' if side_b is None else 'b' if side_a is None else None,
+    }
+
+
+def diff_stock_counts(count_a, count_b):
+    """
+    Compute per-beverage quantity and liters deltas between two stock counts.
+
+    Both counts are aggregated side by side in a single grouped query.
+
+    Args:
+        count_a: Earlier StockCount (e.g. start of an event)
+        count_b: Later StockCount (e.g. end of an event)
+
+    Returns:
+        list: Diff rows ordered by beverage name; ``only_in`` flags beverages present on one side only
+    """
+    from django.db.models import Count, Q, Sum
+    from .models import StockCountItem
+
+    in_a = Q(stock_count_id=count_a.pk)
+    in_b = Q(stock_count_id=count_b.pk)
+    rows = (
+        StockCountItem.objects.filter(stock_count_id__in=[count_a.pk, count_b.pk])
+        .order_by()
+        .values('beverage_id')
+        .annotate(
+            items_a=Count('id', filter=in_a),
+            items_b=Count('id', filter=in_b),
+            quantity_a=Sum('quantity', filter=in_a),
+            quantity_b=Sum('quantity', filter=in_b),
+            liters_a=Sum('liters', filter=in_a),
+            liters_b=Sum('liters', filter=in_b),
+        )
+    )
+
+    catalog = get_catalog()
+    diff = [
+        _diff_row(
+            row['beverage_id'],
+            (row['quantity_a'], row['liters_a']) if row['items_a'] else None,
+            (row['quantity_b'], row['liters_b']) if row['items_b'] else None,
+            catalog
+        )
+        for row in rows
+    ]
+    return sorted(diff, key=lambda row: row['beverage'].lower())
+
+
+def diff_counts_to_live(counts):
+    """
+    Compare stock counts with the live stock of their locations.
+
+    Count items and live stock rows of all locations are read in one UNION
+    query, so every location can be reconciled at once.
+
+    Args:
+        counts: Iterable of StockCount objects, at most one per location
+
+    Returns:
+        dict: Diff rows (as in diff_stock_counts, live stock on side b) per location ID
+    """
+    from django.db.models import DecimalField, F, Value
+    from .models import Stock, StockCountItem
+
+    counts = list(counts)
+    if not counts:
+        return {}
+    location_ids = [count.location_id for count in counts]
+
+    # Both sides select annotations only, so the UNION columns line up
+    columns = ('diff_location', 'diff_beverage', 'diff_quantity', 'diff_liters', 'diff_side')
+    counted = (
+        StockCountItem.objects.filter(stock_count_id__in=[count.pk for count in counts])
+        .order_by()
+        .annotate(
+            diff_location=F('stock_count__location_id'),
+            diff_beverage=F('beverage_id'),
+            diff_quantity=F('quantity'),
+            diff_liters=F('liters'),
+            diff_side=Value('a'),
+        )
+        .values_list(*columns)
+    )
+    live = (
+        Stock.objects.filter(location_id__in=location_ids, beverage__is_active=True)
+        .order_by()
+        .annotate(
+            diff_location=F('location_id'),
+            diff_beverage=F('beverage_id'),
+            diff_quantity=F('quantity'),
+            diff_liters=Value(None, output_field=DecimalField(max_digits=10, decimal_places=2)),
+            diff_side=Value('b'),
+        )
+        .values_list(*columns)
+    )
+
+    sides = {}
+    catalog = get_catalog()
+    for location_id, beverage_id, quantity, liters, side in counted.union(live, all=True):
+        if side == 'b':
+            liters = Decimal(str(round(float(quantity) * (catalog.liters_factor(beverage_id) or 0), 2)))
+        sides.setdefault(location_id, {}).setdefault(beverage_id, {})[side] = (quantity, liters)
+
+    return {
+        location_id: sorted(
+            (
+                _diff_row(beverage_id, values.get('a'), values.get('b'), catalog)
+                for beverage_id, values in sides.get(location_id, {}).items()
+            ),
+            key=lambda row: row['beverage'].lower()
+        )
+        for location_id in location_ids
+    }
+
+
+def get_latest_stock_counts(locations):
+    """
+    Get the most recent stock count of each location.
+
+    Args:
+        locations: QuerySet of Location objects
+
+    Returns:
+        list: StockCount objects ordered by location name (locations without counts are skipped)
+    """
+    from .models import StockCount
+
+    latest = StockCount.objects.filter(location=OuterRef('pk')).order_by('-timestamp').values('pk')[:1]
+    count_ids = locations.annotate(latest_count_id=Subquery(latest)).values_list('latest_count_id', flat=True)
+    return list(
+        StockCount.objects.filter(pk__in=[pk for pk in count_ids if pk is not None])
+        .select_related('location').order_by('location__name')
+    )
@@ -1,39 +1,90 @@
+import csv
+from datetime import timedelta
+import json
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Count, Max
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_http_methods
+from django.conf import settings
 from django.contrib import messages
-from django.db.models.functions import Lower
 from django.utils import timezone
-from django.conf import settings
-from inventory.models import Location, Beverage
-from .models import Stock, StockCount
+from django.utils.dateparse import parse_date
+from bar_inventory.db_router import pin_to_primary, use_replica
+from inventory.access import location_access_required
+from inventory.catalog import get_catalog
+from inventory.models import Location
+from .archive import get_count_history
+from .jobs import enqueue_job, job_output_path
+from .models import Job, Stock, StockCount
 from .utils import (
-    get_location_stock_summary,
+    get_location_stock_summaries,
     prepare_chart_data_for_location,
+    prepare_total_liters_for_location,
     get_or_create_stock_for_location,
+    filter_location_beverages,
     update_stock_quantity,
     adjust_stock_quantity,
-    create_stock_count
+    apply_idempotent,
+    create_stock_count,
+    transfer_stock,
+    get_stock_as_of,
+    serialize_stock_as_of,
+    parse_moment,
+    diff_stock_counts,
+    diff_counts_to_live,
+    get_latest_stock_counts,
+    get_stock_matrix,
+    get_stock_changes,
+    compact_number
 )
-import json
 
+# Number of most recent counts shown in a location overview
+RECENT_COUNT_LIMIT = 30
+
+# Number of stock rows rendered per page of the location detail view
+LOCATION_PAGE_SIZE = 25
+
+# Maximum number of beverage series served by one lazy chart request
+CHART_BATCH_LIMIT = 50
 
+# Maximum number of queued adjustments applied by one batch request
+ADJUST_BATCH_LIMIT = 200
+
+# Seconds a built stock matrix is kept in the cache (keyed by its version)
+STOCK_MATRIX_CACHE_TIMEOUT = 300
+
+# Number of location columns per page of the stock matrix table
+MATRIX_LOCATIONS_PER_PAGE = 20
+
+# Default and maximum number of stock rows per page of the changes feed
+STOCK_CHANGES_PAGE_SIZE = 500
+STOCK_CHANGES_MAX_PAGE_SIZE = 2000
+
+# Number of stock counts (with their items) per page of the changes feed
+STOCK_CHANGES_COUNT_PAGE_SIZE = 50
+
+
+@location_access_required
+@use_replica
 def stock_overview(request, location_id=None):
     """Show overview of stock for a specific location or all locations."""
-    # Check authentication
-    if not request.user.is_authenticated:
-        return redirect('inventory:not_logged_in')
+    access = request.location_access
 
     # Non-staff users can only view their assigned location
-    if not request.user.is_staff:
-        if hasattr(request.user, 'location') and request.user.location:
-            if location_id and location_id != request.user.location.id:
-                # Trying to access a different location
-                return redirect('stock:overview_location', location_id=request.user.location.id)
-            location_id = request.user.location.id
-        else:
+    if not access.is_staff:
+        if access.home_location_id is None:
             # User has no assigned location
             return redirect('inventory:index')
+        if location_id and not access.allows(location_id):
+            # Trying to access a different location
+            return redirect('stock:overview_location', location_id=access.home_location_id)
+        location_id = location_id or access.home_location_id
 
     if location_id:
         selected_location = get_object_or_404(Location, id=location_id, is_active=True)
@@ -47,41 +98,42 @@ def stock_overview(request, location_id=None):
             locations = []
 
     # Get stock summary by location
-    location_summaries = [get_location_stock_summary(loc) for loc in locations]
+    location_summaries = get_location_stock_summaries(locations)
     total_items = sum(s['item_count'] for s in location_summaries)
     total_liters = sum(s['total_liters'] for s in location_summaries)
 
     # Get recent stock counts, filtered by location if specified
     if location_id:
-        recent_counts = StockCount.objects.filter(location_id=location_id).order_by('-timestamp')[:30]
+        recent_counts = StockCount.objects.filter(location_id=location_id).order_by('-timestamp')[:RECENT_COUNT_LIMIT]
     else:
         recent_counts = StockCount.objects.all().order_by('-timestamp')[:10]
 
     # Get all beverages for table columns (or charts if location selected)
+    catalog = get_catalog()
     if location_id:
-        all_beverages = Beverage.objects.filter(
-            is_active=True,
-            available_locations=selected_location
-        ).order_by(Lower('name'))
+        all_beverages = catalog.beverages_for_location(location_id)
     else:
-        all_beverages = Beverage.objects.filter(is_active=True).order_by(Lower('name'))
+        all_beverages = catalog.active_beverages
 
     # Prepare count data with beverage quantities
     count_data = []
     for count in recent_counts:
-        count_items = {item.beverage.id: item.quantity for item in count.items.all()}
+        count_items = {item.beverage_id: item.quantity for item in count.items.all()}
         count_data.append({
             'count': count,
             'beverages': {beverage.id: count_items.get(beverage.id, 0) for beverage in all_beverages}
         })
 
-    # Prepare chart data for location view
-    chart_data = None
-    if location_id and recent_counts:
-        chart_data = prepare_chart_data_for_location(selected_location, recent_counts)
-
-    # Convert chart_data to JSON for JavaScript
-    chart_data_json = json.dumps(chart_data) if chart_data else None
+    # Charts are loaded from the chart data endpoint for location views,
+    # for the recent counts or for a valid ?start=&end= date range
+    chart_data_url = None
+    chart_range = {}
+    if _chart_range(request)[0] is not False:
+        chart_range = {name: request.GET[name].strip() for name in ('start', 'end') if request.GET.get(name, '').strip()}
+    if location_id and (recent_counts or chart_range):
+        chart_data_url = reverse('stock:chart_data', args=[location_id])
+        if chart_range:
+            chart_data_url += '?' + urlencode(chart_range)
 
     context = {
         'selected_location': selected_location,
@@ -90,62 +142,180 @@ def stock_overview(request, location_id=None):
         'total_liters': total_liters,
         'all_beverages': all_beverages,
         'count_data': count_data,
-        'chart_data': chart_data_json,
+        'chart_data_url': chart_data_url,
+        'chart_range': chart_range,
         'current_time': timezone.now(),
-        'DEBUG': settings.DEBUG,
     }
 
     return render(request, 'stock/overview.html', context)
 
 
-def location_detail(request, location_id):
-    """Show all beverages for a specific location with current stock."""
-    # Check authentication
-    if not request.user.is_authenticated:
-        return redirect('inventory:not_logged_in')
+def _chart_range(request):
+    """Parse the optional start and end of a chart range; (False, False) if invalid.
+
+    A bare end date includes the whole day.
+    """
+    bounds = []
+    for name in ('start', 'end'):
+        value = request.GET.get(name, '').strip()
+        moment = parse_moment(value) if value else None
+        if value and moment is None:
+            return False, False
+        if name == 'end' and moment is not None and parse_date(value) is not None:
+            moment += timedelta(days=1, microseconds=-1)
+        bounds.append(moment)
+    return tuple(bounds)
+
+
+def _chart_data_etag(request, location_id):
+    """ETag for a location's chart data: its counts (newest id and total) and reference data version."""
+    if not request.location_access.allows(location_id):
+        return None
+    # The total changes when old counts are pruned, the newest id when one is saved
+    counts = StockCount.objects.filter(location_id=location_id).aggregate(total=Count('id'), latest=Max('id'))
+    return f"{location_id}-{counts['latest']}-{counts['total']}-{get_catalog().version}"
+
+
+@location_access_required(json=True)
+@use_replica
+@gzip_page
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_chart_data_etag)
+def chart_data(request, location_id):
+    """Compact chart payload for a location's recent stock counts, optionally for a batch of beverages (JSON)."""
+    if not request.location_access.allows(location_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    # ?start=&end= charts a date range instead of the recent counts,
+    # ?points=N lowers the point budget per series (4 at least)
+    start, end = _chart_range(request)
+    if start is False:
+        return JsonResponse({'error': 'Parameters "start" and "end" must be ISO dates or datetimes'}, status=400)
+    try:
+        max_points = max(4, min(int(request.GET.get('points', settings.STOCK_CHART_MAX_POINTS)), settings.STOCK_CHART_MAX_POINTS))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid points'}, status=400)
+
+    # ?beverages=1,2,3 limits the payload to a batch of beverages,
+    # ?series=0 returns only the time axis and beverage metadata,
+    # ?series=total only the location's total liters per count
+    beverage_ids = None
+    if request.GET.get('beverages'):
+        try:
+            beverage_ids = [int(value) for value in request.GET['beverages'].split(',')]
+        except ValueError:
+            return JsonResponse({'error': 'Invalid beverage ids'}, status=400)
+        if len(beverage_ids) > CHART_BATCH_LIMIT:
+            return JsonResponse({'error': f'At most {CHART_BATCH_LIMIT} beverages per request'}, status=400)
+    include_series = request.GET.get('series') != '0'
 
     location = get_object_or_404(Location, id=location_id, is_active=True)
+    counts = StockCount.objects.filter(location=location)
+    if start or end:
+        if start:
+            counts = counts.filter(timestamp__gte=start)
+        if end:
+            counts = counts.filter(timestamp__lte=end)
+    else:
+        counts = counts.order_by('-timestamp')[:RECENT_COUNT_LIMIT]
+    if request.GET.get('series') == 'total':
+        payload = prepare_total_liters_for_location(location, counts, max_points)
+        return JsonResponse(payload or {'timestamps': [], 'total_liters': []})
+    payload = prepare_chart_data_for_location(location, counts, beverage_ids, include_series, max_points)
 
-    # Non-staff users can only access their assigned location
-    if not request.user.is_staff:
-        if not (hasattr(request.user, 'location') and request.user.location and request.user.location.id == location_id):
-            # User trying to access a location they're not assigned to
-            if hasattr(request.user, 'location') and request.user.location:
-                return redirect('stock:location_detail', location_id=request.user.location.id)
-            return redirect('inventory:index')
+    return JsonResponse(payload or {'timestamps': [], 'beverages': [], 'series': []})
 
-    stock_data = get_or_create_stock_for_location(location)
 
-    context = {
+def _stock_list_context(request, location):
+    """Filter a location's beverages from the query string and build one page of stock rows."""
+    query = request.GET.get('q', '').strip()
+    try:
+        unit_type_id = int(request.GET['unit_type']) if request.GET.get('unit_type') else None
+    except ValueError:
+        unit_type_id = None
+    low_only = request.GET.get('low') == '1'
+    try:
+        page = max(1, int(request.GET.get('page', '1')))
+    except ValueError:
+        page = 1
+
+    beverages = filter_location_beverages(location, query, unit_type_id, low_only)
+    start = (page - 1) * LOCATION_PAGE_SIZE
+    page_beverages = beverages[start:start + LOCATION_PAGE_SIZE]
+
+    next_query = None
+    if start + LOCATION_PAGE_SIZE < len(beverages):
+        params = request.GET.copy()
+        params['page'] = page + 1
+        next_query = params.urlencode()
+
+    return {
         'location': location,
-        'stock_data': stock_data,
+        'stock_data': get_or_create_stock_for_location(location, page_beverages),
+        'page': page,
+        'next_query': next_query,
+        'filtered': bool(query or unit_type_id or low_only),
+        'filters': {'q': query, 'unit_type': unit_type_id, 'low': low_only},
     }
 
+
+@location_access_required
+def location_detail(request, location_id):
+    """Show the beverages for a specific location with current stock, one page at a time."""
+    access = request.location_access
+
+    # Non-staff users can only access their assigned location
+    if not access.allows(location_id):
+        # User trying to access a location they're not assigned to
+        if access.home_location_id is not None:
+            return redirect('stock:location_detail', location_id=access.home_location_id)
+        return redirect('inventory:index')
+
+    location = get_object_or_404(Location, id=location_id, is_active=True)
+
+    # Stock rows are created when beverages are assigned (and for the rendered page)
+    beverages = get_catalog().beverages_for_location(location.id)
+    unit_types = sorted({(beverage.unit_type_id, beverage.unit_type) for beverage in beverages}, key=lambda unit: unit[1])
+
+    context = _stock_list_context(request, location)
+    context.update({
+        'has_beverages': bool(beverages),
+        'unit_types': unit_types,
+    })
+
     return render(request, 'inventory/location_detail.html', context)
 
 
+@location_access_required
+def location_stock(request, location_id):
+    """Render one filtered page of a location's stock rows via HTMX."""
+    if not request.location_access.allows(location_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    location = get_object_or_404(Location, id=location_id, is_active=True)
+
+    return render(request, 'inventory/partials/stock_list.html', _stock_list_context(request, location))
+
+
 @require_http_methods(["POST"])
+@location_access_required(json=True)
+@pin_to_primary
 def update_stock(request, stock_id):
     """Update stock quantity via HTMX."""
-    # Check authentication
-    if not request.user.is_authenticated:
-        return JsonResponse({'error': 'Authentication required'}, status=401)
-
     stock = get_object_or_404(Stock, id=stock_id)
 
     # Authorization: Check if user has access to this location
-    if not request.user.is_staff:
-        if not (hasattr(request.user, 'location') and request.user.location and request.user.location.id == stock.location.id):
-            return JsonResponse({'error': 'Permission denied'}, status=403)
+    if not request.location_access.allows(stock.location_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
 
     try:
         new_quantity = request.POST.get('quantity', '0')
         updated_by = request.POST.get('updated_by', 'User')
-        stock = update_stock_quantity(stock, new_quantity, updated_by)
+        stock = update_stock_quantity(stock, new_quantity, updated_by, user=request.user)
 
         # Return updated HTML fragment for HTMX
         context = {
-            'beverage': stock.beverage,
+            'beverage': get_catalog().beverage(stock.beverage_id),
             'stock': stock,
             'liters': stock.liters
         }
@@ -155,27 +325,31 @@ def update_stock(request, stock_id):
 
 
 @require_http_methods(["POST"])
+@location_access_required(json=True)
+@pin_to_primary
 def quick_adjust(request, stock_id):
     """Quick adjust stock (increment/decrement) via HTMX."""
-    # Check authentication
-    if not request.user.is_authenticated:
-        return JsonResponse({'error': 'Authentication required'}, status=401)
-
     stock = get_object_or_404(Stock, id=stock_id)
 
     # Authorization: Check if user has access to this location
-    if not request.user.is_staff:
-        if not (hasattr(request.user, 'location') and request.user.location and request.user.location.id == stock.location.id):
-            return JsonResponse({'error': 'Permission denied'}, status=403)
+    if not request.location_access.allows(stock.location_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
 
     try:
         adjustment = request.POST.get('adjustment', '0')
         updated_by = request.POST.get('updated_by', 'User')
-        stock = adjust_stock_quantity(stock, adjustment, updated_by)
+        # A retried request with the same Idempotency-Key is not applied twice
+        key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key', '')
+        _, replayed = apply_idempotent(
+            key, request.user,
+            lambda: _adjustment_result(adjust_stock_quantity(stock, adjustment, updated_by, user=request.user))
+        )
+        if replayed:
+            stock.refresh_from_db()
 
         # Return updated HTML fragment for HTMX
         context = {
-            'beverage': stock.beverage,
+            'beverage': get_catalog().beverage(stock.beverage_id),
             'stock': stock,
             'liters': stock.liters
         }
@@ -184,35 +358,575 @@ def quick_adjust(request, stock_id):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def _adjustment_result(stock):
+    """Result stored for an applied adjustment and returned for its replays."""
+    return {'stock': stock.id, 'quantity': str(stock.quantity)}
+
+
+@require_http_methods(["POST"])
+@location_access_required(json=True)
+@pin_to_primary
+def adjust_batch(request):
+    """Apply a batch of queued quick adjustments, each at most once per idempotency key (JSON).
+
+    Body: {"operations": [{"key": "...", "stock": 12, "adjustment": "-1", "updated_by": "..."}]}
+    """
+    try:
+        operations = json.loads(request.body)['operations']
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            raise ValueError('"operations" must be a list of objects')
+        stock_ids = {int(op.get('stock')) for op in operations}
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid batch: {e}'}, status=400)
+    if len(operations) > ADJUST_BATCH_LIMIT:
+        return JsonResponse({'error': f'At most {ADJUST_BATCH_LIMIT} operations per batch'}, status=400)
+
+    access = request.location_access
+    stocks = Stock.objects.in_bulk(stock_ids)
+    results = []
+    for op in operations:
+        key = str(op.get('key') or '')
+        stock = stocks.get(int(op['stock']))
+        if stock is None or not access.allows(stock.location_id):
+            results.append({'key': key, 'status': 'error', 'error': 'Permission denied'})
+            continue
+        try:
+            result, replayed = apply_idempotent(
+                key, request.user,
+                lambda: _adjustment_result(adjust_stock_quantity(
+                    stock, op.get('adjustment', '0'), str(op.get('updated_by') or 'User')[:100], user=request.user
+                ))
+            )
+        except ArithmeticError:
+            results.append({'key': key, 'status': 'error', 'error': 'Invalid adjustment'})
+            continue
+        except ValueError as e:
+            results.append({'key': key, 'status': 'error', 'error': str(e)})
+            continue
+        results.append({'key': key, 'status': 'duplicate' if replayed else 'applied', **result})
+
+    catalog = get_catalog()
+    current = {}
+    for stock_id, beverage_id, quantity in (
+            Stock.objects.filter(id__in=[stock.id for stock in stocks.values() if access.allows(stock.location_id)])
+            .order_by().values_list('id', 'beverage_id', 'quantity')):
+        factor = catalog.liters_factor(beverage_id) or 0
+        current[stock_id] = {'quantity': compact_number(quantity), 'liters': round(float(quantity) * factor, 2)}
+
+    return JsonResponse({'results': results, 'stocks': current})
+
+
 @require_http_methods(["POST"])
+@location_access_required
+@pin_to_primary
 def save_count(request, location_id):
     """Save current stock count for a location."""
-    # Check authentication
-    if not request.user.is_authenticated:
-        return redirect('inventory:not_logged_in')
-
-    location = get_object_or_404(Location, id=location_id, is_active=True)
+    access = request.location_access
 
     # Authorization: Check if user has access to this location
-    if not request.user.is_staff:
-        if not (hasattr(request.user, 'location') and request.user.location and request.user.location.id == location_id):
-            messages.error(request, 'Permission denied: You can only save counts for your assigned location.')
-            if hasattr(request.user, 'location') and request.user.location:
-                return redirect('stock:location_detail', location_id=request.user.location.id)
-            return redirect('inventory:index')
+    if not access.allows(location_id):
+        messages.error(request, 'Permission denied: You can only save counts for your assigned location.')
+        if access.home_location_id is not None:
+            return redirect('stock:location_detail', location_id=access.home_location_id)
+        return redirect('inventory:index')
 
-    try:
-        # Get all current stock for this location
-        stocks = Stock.objects.filter(location=location, beverage__is_active=True)
+    location = get_object_or_404(Location, id=location_id, is_active=True)
 
-        # Create stock count using utility function
-        stock_count = create_stock_count(
-            location=location,
-            stocks=stocks
-        )
+    try:
+        # Snapshot the location's stock in one consistent read
+        stock_count = create_stock_count(location=location)
 
-        messages.success(request, f'Stock count saved successfully! {stocks.count()} items recorded.')
+        messages.success(request, f'Stock count saved successfully! {stock_count.items.count()} items recorded.')
         return redirect('stock:location_detail', location_id=location_id)
     except Exception as e:
         messages.error(request, f'Error saving count: {str(e)}')
         return redirect('stock:location_detail', location_id=location_id)
+
+
+def _transfer_form_context(request, source_id, entered=None):
+    """Context for the transfer form: locations, and the source's beverages with their stock."""
+    access = request.location_access
+    locations = list(Location.objects.filter(is_active=True))
+    sources = [location for location in locations if access.allows(location.id)]
+    source = next((location for location in sources if location.id == source_id), None)
+    if source is None and sources:
+        source = next((location for location in sources if location.id == access.home_location_id), sources[0])
+
+    rows = []
+    if source is not None:
+        quantities = dict(
+            Stock.objects.filter(location=source).order_by().values_list('beverage_id', 'quantity')
+        )
+        entered = entered or {}
+        rows = [
+            {
+                'beverage': beverage,
+                'available': quantities.get(beverage.id, 0),
+                'entered': entered.get(str(beverage.id), ''),
+            }
+            for beverage in get_catalog().beverages_for_location(source.id)
+        ]
+
+    return {
+        'sources': sources,
+        'source': source,
+        'destinations': [location for location in locations if source is None or location.id != source.id],
+        'rows': rows,
+    }
+
+
+def _transfer_form_error(request, message, source_id, destination_id, entered, note, status=400):
+    """Render the transfer form again with an error and the values entered."""
+    messages.error(request, message)
+    context = _transfer_form_context(request, source_id, entered)
+    context.update({'destination_id': destination_id, 'note': note})
+    return render(request, 'stock/transfer.html', context, status=status)
+
+
+@require_http_methods(["GET", "POST"])
+@location_access_required
+@pin_to_primary
+def transfer(request):
+    """Move stock of many beverages from one location to another.
+
+    GET renders the transfer form (?source=<location id>). POST accepts the
+    form, or a JSON body:
+    {"source": 1, "destination": 2, "note": "", "lines": [{"beverage": 3, "quantity": 6}]}
+    """
+    access = request.location_access
+    is_json = request.content_type == 'application/json'
+
+    if request.method == 'GET':
+        try:
+            source_id = int(request.GET.get('source', ''))
+        except ValueError:
+            source_id = access.home_location_id
+        return render(request, 'stock/transfer.html', _transfer_form_context(request, source_id))
+
+    entered = {}
+    source_id = destination_id = None
+    note = ''
+    try:
+        if is_json:
+            data = json.loads(request.body)
+            source_id = int(data['source'])
+            destination_id = int(data['destination'])
+            note = str(data.get('note', ''))[:255]
+            lines = [(line['beverage'], line['quantity']) for line in data.get('lines', [])]
+        else:
+            note = request.POST.get('note', '')[:255]
+            entered = {
+                key[len('quantity_'):]: value.strip()
+                for key, value in request.POST.items()
+                if key.startswith('quantity_') and value.strip()
+            }
+            lines = list(entered.items())
+            source_id = int(request.POST.get('source', ''))
+            destination_id = int(request.POST.get('destination', ''))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        if is_json:
+            return JsonResponse({'error': 'Invalid transfer'}, status=400)
+        return _transfer_form_error(
+            request, 'Transfer failed: choose a source and a destination location.',
+            source_id, destination_id, entered, note
+        )
+
+    # Authorization: stock can only be moved out of a location the user manages
+    if not access.allows(source_id):
+        if is_json:
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        return _transfer_form_error(
+            request, 'Permission denied: You can only transfer stock out of your assigned location.',
+            None, destination_id, {}, note, status=403
+        )
+
+    source = get_object_or_404(Location, id=source_id, is_active=True)
+    destination = get_object_or_404(Location, id=destination_id, is_active=True)
+
+    try:
+        stock_transfer = transfer_stock(
+            source, destination, lines,
+            updated_by=request.user.get_username(),
+            user=request.user,
+            note=note
+        )
+    except (ValueError, ArithmeticError) as e:
+        if is_json:
+            return JsonResponse({'error': str(e)}, status=400)
+        return _transfer_form_error(request, f'Transfer failed: {e}', source_id, destination_id, entered, note)
+
+    if is_json:
+        return JsonResponse({
+            'id': stock_transfer.id,
+            'source': source.id,
+            'destination': destination.id,
+            'timestamp': stock_transfer.timestamp.isoformat(),
+            'lines': [
+                {'beverage': movement.stock.beverage_id, 'quantity': compact_number(movement.delta)}
+                for movement in stock_transfer.movements.filter(delta__gt=0).select_related('stock')
+            ],
+        })
+
+    line_count = stock_transfer.movements.filter(delta__gt=0).count()
+    messages.success(request, f'Transferred {line_count} beverage(s) from {source.name} to {destination.name}.')
+    return redirect('stock:location_detail', location_id=source.id)
+
+
+@require_http_methods(["GET"])
+@location_access_required(json=True)
+@use_replica
+def stock_as_of(request):
+    """Stock quantities and liters per location at a point in time (JSON).
+
+    Query parameters:
+    - at: ISO date or datetime (required), e.g. 2026-10-18T02:00
+    - location: Optional location ID to limit the result to
+    """
+    access = request.location_access
+    when = parse_moment(request.GET.get('at'))
+    if when is None:
+        return JsonResponse({'error': 'Parameter "at" must be an ISO date or datetime'}, status=400)
+
+    locations = Location.objects.all() if access.is_staff else Location.objects.filter(id__in=access.location_ids)
+    if request.GET.get('location'):
+        try:
+            locations = locations.filter(id=int(request.GET['location']))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid location'}, status=400)
+    elif access.is_staff:
+        locations = locations.filter(is_active=True)
+
+    return JsonResponse({
+        'at': when.isoformat(),
+        'locations': serialize_stock_as_of(get_stock_as_of(when, locations)),
+    })
+
+
+@require_http_methods(["GET"])
+@location_access_required(json=True)
+@use_replica
+@gzip_page
+def count_history(request, location_id):
+    """Stock counts of a location including archived history (JSON).
+
+    Query parameters:
+    - start, end: Optional ISO dates or datetimes limiting the range
+    """
+    if not request.location_access.allows(location_id):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    location = get_object_or_404(Location, id=location_id)
+
+    bounds = {}
+    for name in ('start', 'end'):
+        if request.GET.get(name):
+            bounds[name] = parse_moment(request.GET[name])
+            if bounds[name] is None:
+                return JsonResponse({'error': f'Parameter "{name}" must be an ISO date or datetime'}, status=400)
+
+    return JsonResponse({
+        'location_id': location.id,
+        'location': location.name,
+        'counts': [
+            {
+                'id': count['id'],
+                'timestamp': count['timestamp'].isoformat(),
+                'archived': count['archived'],
+                'items': [
+                    {
+                        'beverage_id': item.beverage_id,
+                        'quantity': compact_number(item.quantity),
+                        'liters': compact_number(item.liters),
+                    }
+                    for item in count['items']
+                ],
+            }
+            for count in get_count_history(location.id, **bounds)
+        ],
+    })
+
+
+@require_http_methods(["GET"])
+@location_access_required(json=True)
+@pin_to_primary
+@gzip_page
+@cache_control(private=True, no_cache=True)
+def stock_changes(request):
+    """Stock rows and stock counts changed since a cursor, for clients that mirror stock (JSON).
+
+    Query parameters:
+    - cursor: Cursor returned by the previous call (omit for a full sync)
+    - location: Optional location ID to limit the feed to
+    - limit: Optional number of stock rows per page
+    """
+    access = request.location_access
+    locations = None if access.is_staff else Location.objects.filter(id__in=access.location_ids)
+    if request.GET.get('location'):
+        try:
+            location_id = int(request.GET['location'])
+        except ValueError:
+            return JsonResponse({'error': 'Invalid location'}, status=400)
+        if not access.allows(location_id):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        locations = Location.objects.filter(id=location_id)
+
+    try:
+        limit = min(max(1, int(request.GET.get('limit', STOCK_CHANGES_PAGE_SIZE))), STOCK_CHANGES_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+
+    try:
+        changes = get_stock_changes(
+            request.GET.get('cursor'),
+            locations=locations,
+            limit=limit,
+            count_limit=STOCK_CHANGES_COUNT_PAGE_SIZE,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(changes)
+
+
+def _serialize_diff_rows(rows):
+    """Convert count diff rows into JSON-serializable data."""
+    def number(value):
+        return None if value is None else compact_number(value)
+
+    return [
+        {
+            'beverage_id': row['beverage_id'],
+            'beverage': row['beverage'],
+            'quantity_a': number(row['quantity_a']),
+            'quantity_b': number(row['quantity_b']),
+            'delta': number(row['delta']),
+            'liters_a': number(row['liters_a']),
+            'liters_b': number(row['liters_b']),
+            'liters_delta': number(row['liters_delta']),
+            'only_in': row['only_in'],
+        }
+        for row in rows
+    ]
+
+
+@require_http_methods(["GET"])
+@location_access_required
+@use_replica
+def count_diff(request):
+    """Compare two stock counts, or a stock count with the live stock.
+
+    Query parameters:
+    - a: ID of the first (earlier) stock count
+    - b: ID of the second stock count (omit to compare with live stock)
+    - format: "json" for a JSON response
+    """
+    access = request.location_access
+    try:
+        count_a = get_object_or_404(StockCount.objects.select_related('location'), id=int(request.GET.get('a', '')))
+        count_b = None
+        if request.GET.get('b'):
+            count_b = get_object_or_404(StockCount.objects.select_related('location'), id=int(request.GET['b']))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid stock count ID'}, status=400)
+
+    if not access.allows(count_a.location_id) or (count_b and not access.allows(count_b.location_id)):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    if count_b is not None:
+        rows = diff_stock_counts(count_a, count_b)
+    else:
+        rows = diff_counts_to_live([count_a])[count_a.location_id]
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'a': {'id': count_a.id, 'location_id': count_a.location_id, 'timestamp': count_a.timestamp.isoformat()},
+            'b': {'id': count_b.id, 'location_id': count_b.location_id, 'timestamp': count_b.timestamp.isoformat()} if count_b else 'live',
+            'items': _serialize_diff_rows(rows),
+        })
+
+    return render(request, 'stock/count_diff.html', {
+        'sections': [{
+            'location': count_a.location,
+            'count_a': count_a,
+            'count_b': count_b,
+            'rows': rows,
+        }],
+    })
+
+
+@require_http_methods(["GET"])
+@location_access_required
+@use_replica
+def reconcile_counts(request):
+    """Compare the latest stock count of every active location with its live stock (staff only)."""
+    if not request.location_access.is_staff:
+        return redirect('inventory:index')
+
+    counts = get_latest_stock_counts(Location.objects.filter(is_active=True))
+    diffs = diff_counts_to_live(counts)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'locations': [
+                {
+                    'location_id': count.location_id,
+                    'location': count.location.name,
+                    'count_id': count.id,
+                    'timestamp': count.timestamp.isoformat(),
+                    'items': _serialize_diff_rows(diffs[count.location_id]),
+                }
+                for count in counts
+            ],
+        })
+
+    return render(request, 'stock/count_diff.html', {
+        'sections': [
+            {'location': count.location, 'count_a': count, 'count_b': None, 'rows': diffs[count.location_id]}
+            for count in counts
+        ],
+        'reconcile': True,
+    })
+
+
+@require_http_methods(["POST"])
+@location_access_required
+def snapshot_counts(request):
+    """Queue a background job saving a stock count for every active location (staff only)."""
+    if not request.location_access.is_staff:
+        return redirect('inventory:index')
+
+    job = enqueue_job('snapshot_locations', user=request.user)
+    messages.info(request, 'Stock counts for all locations are being saved in the background.')
+    return redirect('stock:job_status', job_id=job.id)
+
+
+def _get_job_for_request(request, job_id):
+    """Fetch a job visible to the current user (staff, or the user who queued it)."""
+    job = get_object_or_404(Job, id=job_id)
+    if not request.location_access.is_staff and job.created_by_id != request.user.id:
+        raise Http404('Job not found')
+    return job
+
+
+@require_http_methods(["GET"])
+@location_access_required
+def job_status(request, job_id):
+    """Show the status of a background job."""
+    return render(request, 'stock/job_status.html', {'job': _get_job_for_request(request, job_id)})
+
+
+@require_http_methods(["GET"])
+@location_access_required
+def job_progress(request, job_id):
+    """Render a job's progress bar; polled via HTMX until the job finishes."""
+    return render(request, 'stock/partials/job_progress.html', {'job': _get_job_for_request(request, job_id)})
+
+
+@require_http_methods(["GET"])
+@location_access_required
+def job_download(request, job_id):
+    """Download the file written by a finished export job."""
+    job = _get_job_for_request(request, job_id)
+    if job.status != Job.STATUS_DONE or not (job.result or {}).get('file'):
+        raise Http404('No file for this job')
+
+    extension = job.result['file'].rsplit('.', 1)[-1]
+    try:
+        return FileResponse(open(job_output_path(job, extension), 'rb'), as_attachment=True, filename=job.result['file'])
+    except FileNotFoundError:
+        raise Http404('Job output file no longer exists')
+
+
+def _stock_matrix_version():
+    """Version of the stock matrix: latest stock change, stock row count and reference data version."""
+    stats = Stock.objects.order_by().aggregate(last_updated=Max('last_updated'), rows=Count('id'))
+    last_updated = stats['last_updated'].timestamp() if stats['last_updated'] else 0
+    return f"{last_updated}-{stats['rows']}-{get_catalog().version}"
+
+
+def _stock_matrix_etag(request):
+    """ETag for the stock matrix in the requested format and page."""
+    if not request.location_access.is_staff:
+        return None
+    request.stock_matrix_version = _stock_matrix_version()
+    return f"{request.stock_matrix_version}-{request.GET.get('format', 'html')}-{request.GET.get('page', '1')}"
+
+
+@require_http_methods(["GET"])
+@location_access_required
+@use_replica
+@gzip_page
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_stock_matrix_etag)
+def stock_matrix(request):
+    """Current stock of every beverage at every location, as a table, JSON or CSV (staff only)."""
+    if not request.location_access.is_staff:
+        if request.GET.get('format') in ('json', 'csv'):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        return redirect('inventory:index')
+
+    cache_key = f"stock:matrix:{request.stock_matrix_version}"
+    matrix = cache.get(cache_key)
+    if matrix is None:
+        matrix = get_stock_matrix()
+        cache.set(cache_key, matrix, STOCK_MATRIX_CACHE_TIMEOUT)
+    locations, beverages = matrix['locations'], matrix['beverages']
+
+    output_format = request.GET.get('format')
+    if output_format == 'json':
+        return JsonResponse({
+            'locations': [{'id': location.id, 'name': location.name} for location in locations],
+            'beverages': [
+                {
+                    'id': beverage.id,
+                    'name': beverage.name,
+                    'unit_type': beverage.unit_type,
+                    'liters_per_unit': float(beverage.liters_per_unit),
+                }
+                for beverage in beverages
+            ],
+            'quantities': matrix['quantities'],
+            'liters': matrix['liters'],
+            'totals': {
+                'beverage_quantities': matrix['beverage_quantities'],
+                'beverage_liters': matrix['beverage_liters'],
+                'location_liters': matrix['location_liters'],
+                'liters': matrix['total_liters'],
+            },
+        })
+
+    if output_format == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="stock-matrix.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['Beverage', 'Unit'] + [location.name for location in locations] + ['Total', 'Total liters'])
+        for index, beverage in enumerate(beverages):
+            writer.writerow(
+                [beverage.name, beverage.unit_type]
+                + ['' if value is None else value for value in matrix['quantities'][index]]
+                + [matrix['beverage_quantities'][index], matrix['beverage_liters'][index]]
+            )
+        writer.writerow(['Total liters', ''] + matrix['location_liters'] + ['', matrix['total_liters']])
+        return response
+
+    # The table shows a page of location columns; totals cover all locations
+    try:
+        page = max(1, int(request.GET.get('page', '1')))
+    except ValueError:
+        page = 1
+    columns = slice((page - 1) * MATRIX_LOCATIONS_PER_PAGE, page * MATRIX_LOCATIONS_PER_PAGE)
+
+    return render(request, 'stock/matrix.html', {
+        'locations': locations[columns],
+        'rows': [
+            {
+                'beverage': beverage,
+                'quantities': matrix['quantities'][index][columns],
+                'total': matrix['beverage_quantities'][index],
+                'liters': matrix['beverage_liters'][index],
+            }
+            for index, beverage in enumerate(beverages)
+        ],
+        'location_liters': matrix['location_liters'][columns],
+        'total_liters': matrix['total_liters'],
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if columns.stop < len(locations) else None,
+    })